@@ -2,9 +2,14 @@ import streamlit as st
 from streamlit.components.v1 import html
 import os
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from http.cookiejar import DefaultCookiePolicy
 import json
-from typing import Optional, Dict, Any
-import base64
+from typing import Optional, Dict, Any, List
+import time
+from io import BytesIO
+from PIL import Image, ImageOps
 
 # Configure the page
 st.set_page_config(
@@ -41,6 +46,56 @@ st.markdown(
 # Configuration URLs
 SERVER_URL = os.getenv("SERVER_URL", "https://challenge-sise-production-0bc4.up.railway.app")
 
+# Timeouts HTTP (connexion, lecture) en secondes ; l'upload n'attend que l'envoi du fichier
+REQUEST_TIMEOUT = (5, 30)
+UPLOAD_TIMEOUT = (5, 120)
+
+# Photo de profil : réduite et recompressée avant l'envoi (côté maximal en px, qualité JPEG)
+AVATAR_MAX_SIZE = 512
+AVATAR_JPEG_QUALITY = 85
+
+# Suivi du traitement d'un CV envoyé : intervalle de rafraîchissement (s) et libellés des étapes
+UPLOAD_POLL_INTERVAL = 1.5
+UPLOAD_STAGE_LABELS = {
+    "preprocessing": "Preparing your document...",
+    "ocr": "Reading your CV (OCR)...",
+    "structuring": "Structuring your CV with AI...",
+    "saving": "Saving your profile...",
+}
+
+# Durée (s) pendant laquelle les données du CV en cache sont réutilisées sans requête ;
+# au-delà, elles sont revalidées avec If-None-Match (304 si le CV n'a pas changé)
+CV_CACHE_TTL = float(os.getenv("CV_CACHE_TTL", 60))
+# Durée de validité des statistiques de vues (le serveur ne les écrit que toutes les 30 s)
+STATS_CACHE_TTL = float(os.getenv("STATS_CACHE_TTL", 30))
+
+class TimeoutSession(requests.Session):
+    """requests.Session avec un timeout par défaut sur chaque requête"""
+    def request(self, *args, timeout=REQUEST_TIMEOUT, **kwargs):
+        return super().request(*args, timeout=timeout, **kwargs)
+
+@st.cache_resource
+def http_session() -> requests.Session:
+    """
+    Session HTTP partagée par tout le processus Streamlit : les connexions keep-alive
+    vers l'API sont réutilisées d'une interaction à l'autre (pas de nouveau handshake TLS).
+    """
+    session = TimeoutSession()
+    # Partagée entre utilisateurs : aucun cookie ne doit être conservé
+    session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+    # Retries uniquement pour les méthodes idempotentes et les erreurs transitoires
+    retry = Retry(
+        total=3,
+        backoff_factor=0.5,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=frozenset({"GET", "HEAD", "OPTIONS", "DELETE"}),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=2, pool_maxsize=int(os.getenv("HTTP_POOL_SIZE", 20)), max_retries=retry)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
 # Définir les pages de l'application
 PAGE_LOGIN = "login"
 PAGE_REGISTER = "register"
@@ -48,6 +103,12 @@ PAGE_USER_PROFILE = "profile"
 PAGE_EDIT_CV = "edit_cv"
 PAGE_VIEW_CV = "view_cv"
 
+# Champs lus par la page d'édition (pas d'expériences ni de projets et leurs descriptions)
+EDIT_CV_FIELDS = [
+    "image_base64", "first_name", "last_name", "email", "phone", "location", "job_title",
+    "driving_license", "section1", "skills", "languages", "hobbies", "certifications",
+]
+
 # Initialiser l'état de session
 if "page" not in st.session_state:
     st.session_state.page = PAGE_LOGIN
@@ -66,7 +127,7 @@ def set_page(page: str):
 def login(email: str, password: str) -> bool:
     """Authentifie l'utilisateur avec le serveur API"""
     try:
-        response = requests.post(
+        response = http_session().post(
             f"{SERVER_URL}/api/login",
             json={"email": email, "password": password}
         )
@@ -89,7 +150,7 @@ def login(email: str, password: str) -> bool:
 def register(name: str, email: str, password: str) -> bool:
     """Crée un nouvel utilisateur sur le serveur API"""
     try:
-        response = requests.post(
+        response = http_session().post(
             f"{SERVER_URL}/api/register",
             json={"name": name, "email": email, "password": password}
         )
@@ -115,35 +176,155 @@ def logout():
     st.session_state.user = None
     st.session_state.session_token = None
     st.session_state.page = PAGE_LOGIN
+    st.session_state.pop("cv_cache", None)
+    st.session_state.pop("stats_cache", None)
+
+def cv_cache() -> dict:
+    """Cache des données de CV de la session : {(username, fields, compact): entrée}"""
+    if "cv_cache" not in st.session_state:
+        st.session_state.cv_cache = {}
+    return st.session_state.cv_cache
+
+def invalidate_cv_cache(username: str):
+    """Oublie les données en cache du CV de `username` (à appeler après chaque écriture)"""
+    cache = cv_cache()
+    for key in [key for key in cache if key[0] == username]:
+        del cache[key]
+    
+def get_cv_data(username: str, fields: Optional[List[str]] = None, compact: bool = False) -> Optional[Dict[str, Any]]:
+    """Récupère les données du CV depuis l'API (éventuellement limitées à `fields`), avec cache de session"""
+    params = {}
+    if fields:
+        params["fields"] = ",".join(fields)
+    if compact:
+        params["compact"] = "true"
+    
+    cache = cv_cache()
+    key = (username, params.get("fields"), compact)
+    cached = cache.get(key)
+    if cached and time.monotonic() - cached["fetched_at"] < CV_CACHE_TTL:
+        return cached["data"]
     
-def get_cv_data(username: str) -> Optional[Dict[str, Any]]:
-    """Récupère les données du CV depuis l'API"""
+    headers = {"Authorization": f"Bearer {st.session_state.session_token}"} if st.session_state.session_token else {}
+    if cached and cached["etag"]:
+        headers["If-None-Match"] = cached["etag"]
     try:
-        response = requests.get(
+        response = http_session().get(
             f"{SERVER_URL}/api/cv/{username}",
-            headers={"Authorization": f"Bearer {st.session_state.session_token}"} if st.session_state.session_token else {}
+            params=params,
+            headers=headers
         )
         
+        if response.status_code == 304 and cached:
+            cached["fetched_at"] = time.monotonic()
+            return cached["data"]
         if response.status_code == 200:
-            return response.json()
+            data = response.json()
+            cache[key] = {"data": data, "etag": response.headers.get("ETag"), "fetched_at": time.monotonic()}
+            return data
         return None
     except Exception as e:
         st.error(f"Error retrieving CV data: {e}")
         return None
 
-def update_cv_section(username: str, section: str, content: str) -> bool:
-    """Met à jour une section du CV via l'API"""
+def get_cv_stats(username: str, days: int = 30) -> Optional[Dict[str, Any]]:
+    """Récupère les statistiques de vues de la page publique depuis l'API, avec cache de session"""
+    if "stats_cache" not in st.session_state:
+        st.session_state.stats_cache = {}
+    cache = st.session_state.stats_cache
+    key = (username, days)
+    cached = cache.get(key)
+    # Le suivi d'un upload relance la page toutes les 1,5 s : pas un appel à chaque fois
+    if cached and time.monotonic() - cached["fetched_at"] < STATS_CACHE_TTL:
+        return cached["data"]
+    
+    try:
+        response = http_session().get(
+            f"{SERVER_URL}/api/cv/{username}/stats",
+            params={"days": days},
+            headers={"Authorization": f"Bearer {st.session_state.session_token}"}
+        )
+        
+        if response.status_code == 200:
+            data = response.json()
+            cache[key] = {"data": data, "fetched_at": time.monotonic()}
+            return data
+        return None
+    except Exception:
+        return None
+
+def update_cv_sections(username: str, sections: Dict[str, Any], expected_version: Optional[str] = None) -> tuple:
+    """
+    Met à jour plusieurs sections du CV en une seule requête.
+    Avec `expected_version`, le serveur refuse (409) si le CV a changé depuis son chargement.
+    """
     try:
-        response = requests.post(
-            f"{SERVER_URL}/api/cv/{username}/update",
+        response = http_session().patch(
+            f"{SERVER_URL}/api/cv/{username}",
             headers={"Authorization": f"Bearer {st.session_state.session_token}"},
-            json={"section": section, "content": content}
+            json={"sections": sections, "expected_version": expected_version}
         )
         
-        return response.status_code == 200
+        if response.status_code == 409:
+            return False, "Your CV was modified elsewhere (another tab or a CV upload) since this page was loaded."
+        invalidate_cv_cache(username)
+        if response.status_code == 200:
+            return True, "CV saved successfully"
+        return False, f"Failed to save CV: {response.json().get('detail', 'Unknown error')}"
     except Exception as e:
-        st.error(f"Error updating CV section: {e}")
-        return False
+        return False, f"Error updating CV: {e}"
+
+def parse_lines(text: str) -> list:
+    """Convertit un texte (un élément par ligne) en liste"""
+    return [line.strip() for line in text.split("\n") if line.strip()]
+
+def parse_languages(text: str) -> dict:
+    """Convertit un texte 'Langue: Niveau' (une par ligne) en dictionnaire"""
+    languages = {}
+    for line in text.split("\n"):
+        if ":" in line:
+            lang, level = line.split(":", 1)
+            languages[lang.strip()] = level.strip()
+    return languages
+
+def json_value(value, default):
+    """Valeur d'une section, éventuellement stockée sous forme de chaîne JSON"""
+    if isinstance(value, str):
+        try:
+            return json.loads(value)
+        except ValueError:
+            return default
+    return value or default
+
+def edit_form_values(cv_data: Dict[str, Any]) -> Dict[str, str]:
+    """Valeurs initiales (texte) des champs de la page d'édition"""
+    languages = json_value(cv_data.get("languages"), {})
+    return {
+        "first_name": cv_data.get("first_name", ""),
+        "last_name": cv_data.get("last_name", ""),
+        "email": cv_data.get("email", ""),
+        "phone": cv_data.get("phone", ""),
+        "address": cv_data.get("address", "") or cv_data.get("location", ""),
+        "job_title": cv_data.get("job_title", "") or cv_data.get("title", ""),
+        "driving_license": cv_data.get("driving_license", ""),
+        "summary": cv_data.get("summary", "") or cv_data.get("section1", ""),
+        "skills": "\n".join(json_value(cv_data.get("skills"), [])),
+        "languages": "\n".join(f"{lang}: {level}" for lang, level in languages.items()),
+        "hobbies": "\n".join(json_value(cv_data.get("hobbies"), [])),
+        "certifications": "\n".join(json_value(cv_data.get("certifications"), [])),
+    }
+
+def edit_form_sections(values: Dict[str, str]) -> Dict[str, Any]:
+    """Convertit les valeurs du formulaire d'édition en sections du CV"""
+    sections = dict(values)
+    for field in ("skills", "hobbies", "certifications"):
+        sections[field] = parse_lines(values[field])
+    sections["languages"] = parse_languages(values["languages"])
+    return sections
+
+def changed_sections(original: Dict[str, Any], current: Dict[str, Any]) -> Dict[str, Any]:
+    """Sections dont la valeur diffère de celle chargée (les seules à envoyer)"""
+    return {section: value for section, value in current.items() if value != original.get(section)}
 
 # Ajouter cette fonction pour afficher un lien vers la version publique du CV
 def show_public_cv_link(username: str):
@@ -164,20 +345,24 @@ def show_public_cv_link(username: str):
 
 # Add this function to handle file uploads
 def upload_cv_file(username: str, file) -> bool:
-    """Upload and process a CV file via the server API"""
+    """Upload a CV file via the server API (processing continues on the server as a job)"""
     try:
         # Create the multipart/form-data request
         files = {"file": (file.name, file.getvalue(), f"application/{file.type}")}
         
-        response = requests.post(
+        response = http_session().post(
             f"{SERVER_URL}/api/cv/{username}/upload",
             headers={"Authorization": f"Bearer {st.session_state.session_token}"},
-            files=files
+            files=files,
+            timeout=UPLOAD_TIMEOUT
         )
+        invalidate_cv_cache(username)
         
-        if response.status_code == 200:
+        if response.status_code == 202:
+            # Processing continues on the server: remember the job to follow it
             data = response.json()
-            return True, data.get("message", "CV uploaded and processed successfully")
+            st.session_state.upload_job = {"username": username, "job_id": data["job_id"]}
+            return True, "CV uploaded, processing started"
         else:
             error_detail = "Unknown error"
             try:
@@ -188,14 +373,70 @@ def upload_cv_file(username: str, file) -> bool:
     except Exception as e:
         return False, f"Error uploading CV: {str(e)}"
 
+def get_upload_status(username: str, job_id: str) -> Optional[Dict[str, Any]]:
+    """Récupère l'état du traitement d'un CV envoyé"""
+    try:
+        response = http_session().get(
+            f"{SERVER_URL}/api/cv/{username}/upload/{job_id}",
+            headers={"Authorization": f"Bearer {st.session_state.session_token}"}
+        )
+        
+        if response.status_code == 200:
+            return response.json()
+        return None
+    except Exception:
+        return None
+
+def show_upload_progress(username: str) -> bool:
+    """
+    Affiche l'avancement du CV en cours de traitement.
+    Renvoie True tant que le traitement continue : l'appelant rafraîchit alors la page
+    (poll_upload_progress) une fois tout le reste affiché.
+    """
+    job = st.session_state.get("upload_job")
+    if not job or job["username"] != username:
+        return False
+    
+    status = get_upload_status(username, job["job_id"])
+    if status is None:
+        st.session_state.pop("upload_job", None)
+        st.error("Could not follow the processing of your CV")
+        return False
+    
+    if status["status"] == "done":
+        st.session_state.pop("upload_job", None)
+        invalidate_cv_cache(username)
+        st.success("CV processed successfully")
+    elif status["status"] == "failed":
+        st.session_state.pop("upload_job", None)
+        st.error(status.get("error") or "Error processing CV")
+    else:
+        stages = status["stages"]
+        stage = status["stage"]
+        done = stages.index(stage) if stage in stages else 0
+        text = UPLOAD_STAGE_LABELS.get(stage, "Waiting for processing...")
+        if status["status"] == "queued" and status.get("attempts"):
+            # A failed attempt is retried automatically after a short delay
+            text = f"Temporary error, retrying shortly (attempt {status['attempts'] + 1})..."
+        st.progress(done / len(stages), text=text)
+        return True
+    return False
+
+def poll_upload_progress(processing: bool):
+    """Relance la page après UPLOAD_POLL_INTERVAL tant qu'un CV est en traitement (à appeler en dernier)"""
+    if processing:
+        time.sleep(UPLOAD_POLL_INTERVAL)
+        st.rerun()
+
 # Add this function after the upload_cv_file function
 def delete_cv(username: str) -> tuple:
     """Delete the user's CV via the server API"""
     try:
-        response = requests.delete(
+        response = http_session().delete(
             f"{SERVER_URL}/api/cv/{username}/delete",
             headers={"Authorization": f"Bearer {st.session_state.session_token}"}
         )
+        invalidate_cv_cache(username)
         
         if response.status_code == 200:
             return True, "CV deleted successfully"
@@ -225,16 +466,41 @@ def footer():
     """, unsafe_allow_html=True)
 
 
+def prepare_avatar(file_bytes: bytes) -> bytes:
+    """Oriente (EXIF), réduit à AVATAR_MAX_SIZE et recompresse une photo en JPEG"""
+    image = Image.open(BytesIO(file_bytes))
+    # Pour un JPEG, décode directement à une résolution réduite
+    image.draft("RGB", (AVATAR_MAX_SIZE, AVATAR_MAX_SIZE))
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail((AVATAR_MAX_SIZE, AVATAR_MAX_SIZE), Image.LANCZOS)
+    
+    if image.mode in ("RGBA", "LA", "P"):
+        # Transparence aplatie sur fond blanc (le JPEG n'a pas de canal alpha)
+        image = image.convert("RGBA")
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel("A"))
+        image = background
+    elif image.mode != "RGB":
+        image = image.convert("RGB")
+    
+    output = BytesIO()
+    image.save(output, "JPEG", quality=AVATAR_JPEG_QUALITY, optimize=True, progressive=True)
+    return output.getvalue()
+
 def update_cv_image(username: str, file) -> tuple:
-    """Convert image to base64 and update via the update_cv_section API"""
+    """Downscale the photo and upload it to the image API endpoint"""
     try:
-        # Convert image to base64
-        import base64
-        file_bytes = file.getvalue()
-        base64_image = base64.b64encode(file_bytes).decode('utf-8')
+        avatar = prepare_avatar(file.getvalue())
         
-        # Use the existing update_cv_section function
-        if update_cv_section(username, "image_base64", base64_image):
+        response = http_session().post(
+            f"{SERVER_URL}/api/cv/{username}/image",
+            headers={"Authorization": f"Bearer {st.session_state.session_token}"},
+            files={"file": ("avatar.jpg", avatar, "image/jpeg")},
+            timeout=UPLOAD_TIMEOUT
+        )
+        invalidate_cv_cache(username)
+        
+        if response.status_code == 200:
             return True, "Profile image updated successfully"
         else:
             return False, "Failed to update profile image"
@@ -411,13 +677,11 @@ def show_user_profile():
                 
                 # Process button
                 if st.button("Process CV", use_container_width=True):
-                    with st.spinner("Processing your CV with AI... This may take a moment."):
+                    with st.spinner("Uploading your CV..."):
                         success, message = upload_cv_file(username, uploaded_file)
                         
                         if success:
-                            st.success(message)
-                            
-            
+                            st.info(message)
                         else:
                             st.error(message)
             
@@ -430,6 +694,9 @@ def show_user_profile():
                 elif file_extension == 'pdf':
                     st.info("PDF preview not available")
         
+        # Progress of the CV being processed by the server
+        upload_processing = show_upload_progress(username)
+        
         st.markdown('</div>', unsafe_allow_html=True)
     
     with tab2:
@@ -489,6 +756,25 @@ def show_user_profile():
         
         st.markdown('</div>', unsafe_allow_html=True)
         
+        # Public page views (aggregated by the server and written every ~30 seconds)
+        stats = get_cv_stats(username)
+        if stats is not None:
+            st.markdown('<div class="section-container">', unsafe_allow_html=True)
+            st.markdown('<h2 class="section-title">Profile Views</h2>', unsafe_allow_html=True)
+            
+            col1, col2 = st.columns([1, 2])
+            with col1:
+                st.metric(f"Views (last {stats['days']} days)", stats["total"])
+                for theme, views in sorted(stats["by_theme"].items(), key=lambda item: -item[1]):
+                    st.write(f"**{theme.capitalize()}**: {views}")
+            with col2:
+                if stats["by_day"]:
+                    st.bar_chart({"views": {row["day"]: row["views"] for row in stats["by_day"]}})
+                else:
+                    st.info("No views yet. Share your public link to get your first visitors!")
+            
+            st.markdown('</div>', unsafe_allow_html=True)
+        
         # Danger Zone
         st.markdown('<div class="section-container">', unsafe_allow_html=True)
         st.markdown('<div class="danger-zone">', unsafe_allow_html=True)
@@ -522,6 +808,9 @@ def show_user_profile():
             st.rerun()
         st.markdown('</div>', unsafe_allow_html=True)
     footer()
+    
+    # Last, so that both tabs are rendered while the CV is being processed
+    poll_upload_progress(upload_processing)
 def show_view_cv():
     if not st.session_state.user:
         st.session_state.page = PAGE_LOGIN
@@ -574,7 +863,7 @@ def show_edit_cv():
     username = st.session_state.user["name"]
     st.title(f"Edit {username}'s CV")
     
-    cv_data = get_cv_data(username)
+    cv_data = get_cv_data(username, fields=EDIT_CV_FIELDS)
     
     if not cv_data:
         st.warning("CV data could not be loaded")
@@ -618,163 +907,82 @@ def show_edit_cv():
                 else:
                     st.error(message)
     
+    # Every field starts from the loaded CV; only the fields that differ are saved
+    original = edit_form_values(cv_data)
+    form_key = st.session_state.setdefault("edit_form_generation", 0)
+    
+    def field_key(field: str) -> str:
+        return f"edit_{field}_{form_key}"
+    
+    values = {}
+    
     # Name fields
     col1, col2 = st.columns(2)
     with col1:
-        first_name = st.text_input("First Name", value=cv_data.get("first_name", ""))
-        if st.button("Update First Name"):
-            if update_cv_section(username, "first_name", first_name):
-                st.success("First name updated successfully")
-            else:
-                st.error("Failed to update first name")
-    
+        values["first_name"] = st.text_input("First Name", value=original["first_name"], key=field_key("first_name"))
     with col2:
-        last_name = st.text_input("Last Name", value=cv_data.get("last_name", ""))
-        if st.button("Update Last Name"):
-            if update_cv_section(username, "last_name", last_name):
-                st.success("Last name updated successfully")
-            else:
-                st.error("Failed to update last name")
+        values["last_name"] = st.text_input("Last Name", value=original["last_name"], key=field_key("last_name"))
     
     # Contact information
     st.subheader("Contact Information")
     
     col1, col2, col3 = st.columns(3)
     with col1:
-        email = st.text_input("Email", value=cv_data.get("email", ""))
-        if st.button("Update Email"):
-            if update_cv_section(username, "email", email):
-                st.success("Email updated successfully")
-            else:
-                st.error("Failed to update email")
-    
+        values["email"] = st.text_input("Email", value=original["email"], key=field_key("email"))
     with col2:
-        phone = st.text_input("Phone", value=cv_data.get("phone", ""))
-        if st.button("Update Phone"):
-            if update_cv_section(username, "phone", phone):
-                st.success("Phone updated successfully")
-            else:
-                st.error("Failed to update phone")
-    
+        values["phone"] = st.text_input("Phone", value=original["phone"], key=field_key("phone"))
     with col3:
-        address = st.text_input("Address", value=cv_data.get("address", "") or cv_data.get("location", ""))
-        if st.button("Update Address"):
-            if update_cv_section(username, "address", address):
-                st.success("Address updated successfully")
-            else:
-                st.error("Failed to update address")
+        values["address"] = st.text_input("Address", value=original["address"], key=field_key("address"))
     
     # Professional information
     st.header("Professional Information")
-    
-    # Job title
-    job_title = st.text_input("Job Title", value=cv_data.get("job_title", "") or cv_data.get("title", ""))
-    if st.button("Update Job Title"):
-        if update_cv_section(username, "job_title", job_title):
-            st.success("Job title updated successfully")
-        else:
-            st.error("Failed to update job title")
-    
-    # Driving license
-    driving_license = st.text_input("Driving License", value=cv_data.get("driving_license", ""))
-    if st.button("Update Driving License"):
-        if update_cv_section(username, "driving_license", driving_license):
-            st.success("Driving license updated successfully")
-        else:
-            st.error("Failed to update driving license")
+    values["job_title"] = st.text_input("Job Title", value=original["job_title"], key=field_key("job_title"))
+    values["driving_license"] = st.text_input("Driving License", value=original["driving_license"], key=field_key("driving_license"))
     
     # About/Summary
     st.header("About Me")
-    summary = st.text_area("Professional Summary", value=cv_data.get("summary", "") or cv_data.get("section1", ""))
-    if st.button("Update Summary"):
-        if update_cv_section(username, "summary", summary):
-            st.success("Summary updated successfully")
-        else:
-            st.error("Failed to update summary")
+    values["summary"] = st.text_area("Professional Summary", value=original["summary"], key=field_key("summary"))
     
     # Skills
     st.header("Skills")
-    
-    # Get existing skills or empty list
-    existing_skills = cv_data.get("skills", [])
-    if isinstance(existing_skills, str):
-        try:
-            # Try to parse if it's a JSON string
-            existing_skills = json.loads(existing_skills)
-        except:
-            existing_skills = []
-    
-    skills_text = st.text_area("Skills (one per line)", value="\n".join(existing_skills))
-    if st.button("Update Skills"):
-        skills_list = [skill.strip() for skill in skills_text.split("\n") if skill.strip()]
-        if update_cv_section(username, "skills", skills_list):
-            st.success("Skills updated successfully")
-        else:
-            st.error("Failed to update skills")
+    values["skills"] = st.text_area("Skills (one per line)", value=original["skills"], key=field_key("skills"))
     
     # Languages
     st.header("Languages")
-    
-    # Get existing languages or empty dict
-    existing_languages = cv_data.get("languages", {})
-    if isinstance(existing_languages, str):
-        try:
-            existing_languages = json.loads(existing_languages)
-        except:
-            existing_languages = {}
-    
-    languages_text = st.text_area("Languages (format: Language: Level)", 
-                               value="\n".join([f"{lang}: {level}" for lang, level in existing_languages.items()]))
-    
-    if st.button("Update Languages"):
-        languages_dict = {}
-        for line in languages_text.split("\n"):
-            if ":" in line:
-                lang, level = line.split(":", 1)
-                languages_dict[lang.strip()] = level.strip()
-        
-        if update_cv_section(username, "languages", languages_dict):
-            st.success("Languages updated successfully")
-        else:
-            st.error("Failed to update languages")
+    values["languages"] = st.text_area("Languages (format: Language: Level)", value=original["languages"], key=field_key("languages"))
     
     # Hobbies
     st.header("Hobbies")
-    
-    # Get existing hobbies or empty list
-    existing_hobbies = cv_data.get("hobbies", [])
-    if isinstance(existing_hobbies, str):
-        try:
-            existing_hobbies = json.loads(existing_hobbies)
-        except:
-            existing_hobbies = []
-    
-    hobbies_text = st.text_area("Hobbies (one per line)", value="\n".join(existing_hobbies))
-    if st.button("Update Hobbies"):
-        hobbies_list = [hobby.strip() for hobby in hobbies_text.split("\n") if hobby.strip()]
-        if update_cv_section(username, "hobbies", hobbies_list):
-            st.success("Hobbies updated successfully")
-        else:
-            st.error("Failed to update hobbies")
+    values["hobbies"] = st.text_area("Hobbies (one per line)", value=original["hobbies"], key=field_key("hobbies"))
     
     # Certifications
     st.header("Certifications")
+    values["certifications"] = st.text_area("Certifications (one per line)", value=original["certifications"], key=field_key("certifications"))
     
-    # Get existing certifications or empty list
-    existing_certifications = cv_data.get("certifications", [])
-    if isinstance(existing_certifications, str):
-        try:
-            existing_certifications = json.loads(existing_certifications)
-        except:
-            existing_certifications = []
-    
-    certifications_text = st.text_area("Certifications (one per line)", value="\n".join(existing_certifications))
-    if st.button("Update Certifications"):
-        certifications_list = [cert.strip() for cert in certifications_text.split("\n") if cert.strip()]
-        if update_cv_section(username, "certifications", certifications_list):
-            st.success("Certifications updated successfully")
+    # Save the changed fields in a single request, against the loaded version
+    st.divider()
+    changes = changed_sections(edit_form_sections(original), edit_form_sections(values))
+    if changes:
+        st.caption(f"Unsaved changes: {', '.join(changes)}")
+    
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        save_clicked = st.button("Save Changes", type="primary", use_container_width=True, disabled=not changes)
+    with col2:
+        reload_clicked = st.button("Discard & Reload", use_container_width=True)
+    
+    if save_clicked:
+        success, message = update_cv_sections(username, changes, cv_data.get("version"))
+        if success:
+            st.success(message)
         else:
-            st.error("Failed to update certifications")
+            st.error(message)
+            st.info("Your edits are still in the form. Use \"Discard & Reload\" to load the latest version.")
+    
+    if reload_clicked:
+        invalidate_cv_cache(username)
+        st.session_state.edit_form_generation = form_key + 1
+        st.rerun()
     
     # Link to public CV
     show_public_cv_link(username)
@@ -1,28 +1,43 @@
 from fastapi import FastAPI, Request, Form, HTTPException, Depends, Cookie, Body, Header, File, UploadFile
-from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse
+from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse, FileResponse, Response
 from fastapi.templating import Jinja2Templates
-from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBasic
-import uvicorn
 import os
 import logging
 from typing import Dict, Any, Optional, List
 from pydantic import BaseModel
 from pymongo import MongoClient
 from bson import ObjectId
-import bcrypt
 from datetime import datetime, timedelta
 import secrets
 import tempfile
-import json
 import asyncio
-from modules.pdf_preprocessing import remove_background_from_pdf
-from modules.ocr_extraction import extract_text_and_first_image_from_pdf, extract_text_from_pdf, extract_text_from_image
-from modules.llm_structuring import structure_cv_json
-from modules.cv_utils import add_cv_to_user
-from pdf2image import convert_from_path
-import tempfile
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import asynccontextmanager
+from urllib.parse import quote
+from modules.cv_pipeline import STAGES, SUPPORTED_EXTENSIONS, file_extension
+from modules.upload_jobs import STATUS_DONE, ensure_job_indexes, create_job, find_job
+from modules.job_queue import LEASE_SECONDS, MAX_ATTEMPTS, ensure_queue_indexes, claim_refresh, claim_pending_refreshes
+from modules.pipeline_worker import PipelineWorker
+from modules.cv_store import (
+    USER_ID_PROJECTION, cv_api_projection,
+    ensure_cv_indexes, find_user_id, find_user_profile, find_cv, find_public_page, apply_section_changes,
+    cv_version, parse_cv_version,
+)
+from modules.caching import TTLCache, ByteLRUCache
+from modules.cv_rendering import build_cv_context, template_name_for, resolve_theme, create_environment, preload_templates, templates_fingerprint
+from modules.snapshots import SNAPSHOT_THEMES, write_snapshot, write_snapshot_version, snapshot_version, stale_snapshot_users, find_snapshot
+from modules.passwords import hash_password_async, verify_password_async, needs_rehash, shutdown as shutdown_password_pool
+from modules.http_caching import CompressionMiddleware, make_etag, etag_matches
+from modules.static_assets import ImmutableStaticFiles, build_assets, asset_url_factory, manifest_fingerprint
+from modules.pdf_export import html_to_pdf
+from modules.fast_json import FastJSONResponse
+from modules.view_counter import ViewCounter, view_stats
+from modules.avatars import avatar_base64
+from modules.health import provider_stats, mongo_status, queue_status
 
 # Classes pour validation
 class LoginRequest(BaseModel):
@@ -36,7 +51,11 @@ class RegisterRequest(BaseModel):
 
 class CVUpdateRequest(BaseModel):
     section: str
-    content: str
+    content: Any
+
+class CVPatchRequest(BaseModel):
+    sections: Dict[str, Any]
+    expected_version: Optional[str] = None
 
 # Configuration du logging
 logging.basicConfig(
@@ -45,7 +64,56 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Prepare the shared resources of a worker process, and release them on shutdown"""
+    global ASSETS_VERSION, SNAPSHOTS_VERSION
+    # Minify the theme stylesheets (written atomically: every worker builds the same files)
+    ASSET_MANIFEST.update(build_assets("assets", "static"))
+    ASSETS_VERSION = manifest_fingerprint(ASSET_MANIFEST)
+    SNAPSHOTS_VERSION = f"{TEMPLATES_VERSION}-{ASSETS_VERSION}"
+    # Compile every theme before serving the first request
+    preload_templates(templates.env)
+    # Re-render the snapshots left by a deploy with other templates or assets
+    if STATIC_SNAPSHOTS:
+        snapshot_executor.submit(regenerate_stale_snapshots)
+    # Expire old upload jobs, and index the queue
+    ensure_job_indexes(upload_jobs_collection)
+    ensure_queue_indexes(upload_jobs_collection)
+    # Index the lookups of the public page (user by name, CV by user, session by token)
+    ensure_cv_indexes(users_collection, cvs_collection, sessions_collection)
+    # Process queued uploads in this process unless a separate worker tier does it
+    if pipeline_worker.concurrency:
+        pipeline_worker.start()
+    # Start the periodic flush of page view counters
+    view_counter.start()
+    # Refresh caches and snapshots after uploads that nobody followed to the end
+    refresh_task = asyncio.get_running_loop().create_task(sweep_upload_refreshes())
+    
+    yield
+    
+    refresh_task.cancel()
+    try:
+        await refresh_task
+    except asyncio.CancelledError:
+        pass
+    # Refuse new uploads; running pipelines get UPLOAD_DRAIN_TIMEOUT to finish, the
+    # others go back to the queue with their OCR/LLM checkpoints
+    app.state.draining = True
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, pipeline_worker.stop, UPLOAD_DRAIN_TIMEOUT)
+    # Write the views counted since the last flush
+    await view_counter.stop()
+    # Let running exports and snapshots finish before closing MongoDB
+    for executor in (pdf_executor, snapshot_executor):
+        await loop.run_in_executor(None, executor.shutdown)
+    await loop.run_in_executor(None, shutdown_password_pool)
+    client.close()
+
+# API responses are serialized with orjson (see modules/fast_json.py)
+app = FastAPI(default_response_class=FastJSONResponse, lifespan=lifespan)
+# Set by the lifespan when the process starts shutting down
+app.state.draining = False
 
 # Enable CORS
 app.add_middleware(
@@ -56,13 +124,30 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress text responses (brotli when the client accepts it, gzip otherwise)
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=int(os.getenv("COMPRESSION_MIN_SIZE", 1024)),
+    gzip_level=int(os.getenv("GZIP_LEVEL", 6)),
+    brotli_quality=int(os.getenv("BROTLI_QUALITY", 5)),
+)
+
 # Create directories if they don't exist
 os.makedirs("templates", exist_ok=True)
 os.makedirs("static", exist_ok=True)
 
 # Setup Jinja2 templates and static files
-templates = Jinja2Templates(directory="templates")
-app.mount("/static", StaticFiles(directory="static"), name="static")
+# Compiled bytecode is cached on disk and shared by every worker process
+JINJA_CACHE_DIR = os.getenv("JINJA_CACHE_DIR", os.path.join(tempfile.gettempdir(), "cvvision-jinja-cache"))
+templates = Jinja2Templates(env=create_environment("templates", JINJA_CACHE_DIR))
+# Theme stylesheets are minified into content-hashed files served with immutable
+# caching; the lifespan builds them and fills the manifest
+ASSET_MANIFEST = {}
+templates.env.globals["asset_url"] = asset_url_factory(ASSET_MANIFEST)
+# Part of the page ETags, so that a template or stylesheet change invalidates browser caches
+TEMPLATES_VERSION = templates_fingerprint("templates")
+ASSETS_VERSION = manifest_fingerprint(ASSET_MANIFEST)
+app.mount("/static", ImmutableStaticFiles(directory="static"), name="static")
 
 security = HTTPBasic()
 
@@ -73,6 +158,9 @@ db = client["Challenge_SISE"]  # Base de données
 users_collection = db["users"]  # Collection des utilisateurs
 cvs_collection = db["cvs"]      # Collection des CV
 sessions_collection = db["sessions"]  # Nouvelle collection pour les sessions
+profile_views_collection = db["profile_views"]  # Compteurs de vues par utilisateur, thème et jour
+upload_jobs_collection = db["upload_jobs"]  # File des traitements de CV envoyés
+upload_dead_letters_collection = db["upload_jobs_dead"]  # Jobs d'upload qui ont épuisé leurs tentatives
 
 # URLs for redirects
 SERVER_URL = os.getenv("SERVER_URL", "https://challenge-sise-production-0bc4.up.railway.app")
@@ -80,43 +168,112 @@ CLIENT_URL = os.getenv("CLIENT_URL", "https://beneficial-liberation-production.u
 logger.debug(f"CLIENT_URL: {CLIENT_URL}")
 logger.debug(f"SERVER_URL: {SERVER_URL}")
 
-# Helper Functions
-def hash_password(password: str) -> str:
-    """Hash a password for storing"""
-    salt = bcrypt.gensalt()
-    hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
-    return hashed.decode('utf-8')
+# Short-lived negative cache of user names without a profile, so that crawlers
+# and typos on public URLs don't hit MongoDB on every request
+unknown_profiles = TTLCache(
+    maxsize=int(os.getenv("NEGATIVE_CACHE_SIZE", 10000)),
+    ttl=float(os.getenv("NEGATIVE_CACHE_TTL", 30)),
+)
+
+# Rendered public pages, keyed by (user name, template, CV updated_at, is_owner, logged_in)
+rendered_pages = ByteLRUCache(max_bytes=int(os.getenv("PAGE_CACHE_MAX_BYTES", 64 * 1024 * 1024)))
+
+# Write-through static snapshots of public pages, precompressed so that the
+# server or a reverse proxy can serve anonymous traffic without rendering
+STATIC_SNAPSHOTS = os.getenv("STATIC_SNAPSHOTS", "false").lower() in ("1", "true", "yes")
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", os.path.join("static", "cv"))
+# A single thread renders snapshots in write order, so the last write always wins
+snapshot_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="snapshots")
+# Templates and assets the snapshots are rendered with; older snapshots are not served
+SNAPSHOTS_VERSION = f"{TEMPLATES_VERSION}-{ASSETS_VERSION}"
+
+# PDF exports, keyed by (user name, template, CV updated_at) and converted on a
+# bounded pool of processes: PyMuPDF is not thread-safe and keeps the GIL while it
+# lays out pages, so export threads would still starve the event loop. The pool
+# receives the rendered HTML and returns the PDF bytes; it is spawned rather than
+# forked since this process already runs threads.
+rendered_pdfs = ByteLRUCache(max_bytes=int(os.getenv("PDF_CACHE_MAX_BYTES", 32 * 1024 * 1024)))
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", 2))
+
+def new_pdf_executor() -> ProcessPoolExecutor:
+    return ProcessPoolExecutor(max_workers=PDF_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+
+pdf_executor = new_pdf_executor()
+
+# CV uploads are queued in the upload_jobs collection and processed (preprocessing,
+# OCR, LLM) by worker.py processes, which serve.py starts next to the web workers.
+# UPLOAD_WORKERS > 0 processes them in each web process instead (development)
+pipeline_worker = PipelineWorker(
+    upload_jobs_collection, upload_dead_letters_collection, cvs_collection,
+    concurrency=int(os.getenv("UPLOAD_WORKERS", 0)),
+    poll_interval=float(os.getenv("UPLOAD_POLL_INTERVAL", 2)),
+    lease_seconds=int(os.getenv("UPLOAD_LEASE_SECONDS", LEASE_SECONDS)),
+    max_attempts=int(os.getenv("UPLOAD_MAX_ATTEMPTS", MAX_ATTEMPTS)),
+    reap_interval=float(os.getenv("UPLOAD_REAP_INTERVAL", 60)),
+)
+
+# Period of the sweep that refreshes caches and snapshots after finished uploads
+REFRESH_SWEEP_INTERVAL = float(os.getenv("REFRESH_SWEEP_INTERVAL", 10))
+
+# On shutdown, time given to running pipelines before they are handed back to the queue
+UPLOAD_DRAIN_TIMEOUT = float(os.getenv("UPLOAD_DRAIN_TIMEOUT", 20))
+
+# Uploaded CV files travel inside the job document (MongoDB documents are limited to 16 MB)
+MAX_CV_UPLOAD_BYTES = int(os.getenv("MAX_CV_UPLOAD_BYTES", 10 * 1024 * 1024))
+
+# Largest profile photo accepted before normalization (downscaled JPEG)
+MAX_IMAGE_UPLOAD_BYTES = int(os.getenv("MAX_IMAGE_UPLOAD_BYTES", 15 * 1024 * 1024))
 
-def verify_password(stored_password: str, provided_password: str) -> bool:
-    """Verify a stored password against one provided by user"""
-    return bcrypt.checkpw(provided_password.encode('utf-8'), stored_password.encode('utf-8'))
+# Public page views are counted in memory and flushed periodically in one bulk write
+view_counter = ViewCounter(profile_views_collection, flush_interval=float(os.getenv("VIEW_FLUSH_INTERVAL", 30)))
 
-def create_user(name: str, email: str, password: str):
+# Readiness checks run at most once per READINESS_CACHE_SECONDS, however often probes
+# come, and are abandoned after HEALTH_CHECK_TIMEOUT (MongoDB unreachable)
+readiness_reports = TTLCache(maxsize=1, ttl=float(os.getenv("READINESS_CACHE_SECONDS", 5)))
+HEALTH_CHECK_TIMEOUT = float(os.getenv("HEALTH_CHECK_TIMEOUT", 2))
+
+NOT_FOUND_PAGE = "<html><body><h1>Not found</h1><p>No CV found for this user.</p></body></html>"
+
+# Clients must revalidate with If-None-Match; unchanged CVs then cost a 304
+REVALIDATE_HEADERS = {"Cache-Control": "no-cache"}
+
+# Helper Functions
+async def create_user(name: str, email: str, password: str):
     """Create a new user in MongoDB"""
     # Check if user already exists
-    if users_collection.find_one({"email": email}):
+    if users_collection.find_one({"email": email}, USER_ID_PROJECTION):
         raise HTTPException(status_code=400, detail="Email already registered")
-    if users_collection.find_one({"user_name": name}):
+    if users_collection.find_one({"user_name": name}, USER_ID_PROJECTION):
         raise HTTPException(status_code=400, detail="Username already taken")
     
     # Create user
     user_data = {
         "email": email,
-        "password_hash": hash_password(password),
+        "password_hash": await hash_password_async(password),
         "user_name": name,
         "created_at": datetime.utcnow()
     }
     
     result = users_collection.insert_one(user_data)
+    
+    # The name now has a profile
+    unknown_profiles.pop(name)
     return result.inserted_id
 
-def authenticate_user(email: str, password: str):
+async def authenticate_user(email: str, password: str):
     """Authenticate a user"""
     user = users_collection.find_one({"email": email})
     
-    if not user or not verify_password(user["password_hash"], password):
+    if not user or not await verify_password_async(user["password_hash"], password):
         return None
     
+    # Upgrade the hash when the configured bcrypt cost has changed
+    if needs_rehash(user["password_hash"]):
+        users_collection.update_one(
+            {"_id": user["_id"]},
+            {"$set": {"password_hash": await hash_password_async(password)}}
+        )
+    
     return {
         "id": str(user["_id"]),
         "name": user["user_name"],
@@ -148,7 +305,7 @@ def get_user_from_session(token: str):
     if not session:
         return None
     
-    user = users_collection.find_one({"_id": ObjectId(session["user_id"])})
+    user = find_user_profile(users_collection, {"_id": ObjectId(session["user_id"])})
     if not user:
         return None
     
@@ -176,24 +333,6 @@ async def get_current_user(request: Request):
     
     return get_user_from_session(token)
 
-def get_or_create_user_by_name(name: str):
-    """Get or create a user by name"""
-    user = users_collection.find_one({"user_name": name})
-    
-    if user:
-        return str(user["_id"])
-    
-    # Create new user
-    new_user = {
-        "user_name": name,
-        "email": f"{name}@example.com",
-        "password_hash": hash_password("temporary"),
-        "created_at": datetime.utcnow()
-    }
-    
-    result = users_collection.insert_one(new_user)
-    return str(result.inserted_id)
-
 def get_cv_content(user_id: str):
     """Get CV content for a user"""
     cv = cvs_collection.find_one({"user_id": user_id})
@@ -219,44 +358,100 @@ def get_cv_content(user_id: str):
     
     return cv
 
-def update_cv_section(user_id: str, section: str, content: str):
+def render_cv_page(name: str, template_name: str, sections: Optional[dict],
+                   is_owner: bool = False, logged_in: bool = False, print_mode: bool = False) -> bytes:
+    """Render a public CV page to UTF-8 bytes"""
+    # Prepare template data with base info
+    template_data = {
+        "name": name,
+        "SERVER_URL": SERVER_URL,
+        "CLIENT_URL": CLIENT_URL,
+        "is_owner": is_owner,
+        "logged_in": logged_in,
+        "print_mode": print_mode,
+    }
+    template_data.update(build_cv_context(name, sections))
+    
+    return templates.get_template(template_name).render(template_data).encode("utf-8")
+
+async def render_cv_pdf(name: str, template_name: str, sections: Optional[dict]) -> bytes:
+    """Render a CV in print mode and convert it to PDF on the export processes"""
+    global pdf_executor
+    html = render_cv_page(name, template_name, sections, print_mode=True).decode("utf-8")
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(pdf_executor, html_to_pdf, html, ".")
+    except BrokenProcessPool:
+        # An export process died (e.g. out of memory), which breaks the whole pool:
+        # replace it and try once more
+        logger.warning("PDF export pool broken, starting a new one")
+        pdf_executor = new_pdf_executor()
+        return await loop.run_in_executor(pdf_executor, html_to_pdf, html, ".")
+
+def regenerate_snapshots(name: str):
+    """Render a user's public page in every theme and write it as static files"""
+    try:
+        page = find_public_page(users_collection, cvs_collection, sessions_collection, name)
+        if not page:
+            return
+        
+        sections = (page.get("cv") or {}).get("sections")
+        for theme in SNAPSHOT_THEMES:
+            write_snapshot(SNAPSHOT_DIR, name, theme, render_cv_page(name, template_name_for(theme), sections))
+        write_snapshot_version(SNAPSHOT_DIR, name, SNAPSHOTS_VERSION)
+        logger.debug(f"Snapshots regenerated for {name}")
+    except Exception as e:
+        logger.error(f"Error regenerating snapshots for {name}: {e}", exc_info=True)
+
+def regenerate_stale_snapshots():
+    """Re-render the snapshots written with other templates or assets than this deploy's"""
+    try:
+        names = stale_snapshot_users(SNAPSHOT_DIR, SNAPSHOTS_VERSION)
+    except Exception as e:
+        logger.error(f"Error listing stale snapshots: {e}")
+        return
+    for name in names:
+        # Another worker of the same deploy may have got there first
+        if snapshot_version(SNAPSHOT_DIR, name) != SNAPSHOTS_VERSION:
+            regenerate_snapshots(name)
+    if names:
+        logger.info(f"Stale snapshots regenerated for {len(names)} users")
+
+def after_cv_write(name: str):
+    """Drop cached renderings of a user's CV and refresh its static snapshots"""
+    rendered_pages.invalidate(lambda key: key[0] == name)
+    rendered_pdfs.invalidate(lambda key: key[0] == name)
+    
+    if STATIC_SNAPSHOTS:
+        snapshot_executor.submit(regenerate_snapshots, name)
+
+async def sweep_upload_refreshes():
+    """Refresh caches and snapshots after finished uploads whose status nobody polled"""
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(REFRESH_SWEEP_INTERVAL)
+        try:
+            jobs = await loop.run_in_executor(None, claim_pending_refreshes, upload_jobs_collection)
+        except Exception as e:
+            logger.error(f"Error sweeping finished uploads: {e}")
+            continue
+        for job in jobs:
+            after_cv_write(job["user_name"])
+
+def update_cv_sections(user_id: str, changes: Dict[str, Any], expected_version: datetime = None):
+    """Update several sections of a user's CV in a single write, returning the new version"""
+    try:
+        updated_at = apply_section_changes(cvs_collection, user_id, changes, expected_version)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    if updated_at is None:
+        raise HTTPException(status_code=409, detail="The CV was modified since it was loaded")
+    return updated_at
+
+def update_cv_section(user_id: str, section: str, content: Any):
     """Update a section of a user's CV"""
-    # Check if CV exists
-    cv = cvs_collection.find_one({"user_id": ObjectId(user_id)})
-    
-    if cv:
-        # Update existing CV
-        if "sections" in cv:
-            # Modern format with nested sections
-            cvs_collection.update_one(
-                {"user_id": ObjectId(user_id)},
-                {
-                    "$set": {
-                        f"sections.{section}": content,
-                        "updated_at": datetime.utcnow()
-                    }
-                }
-            )
-        else:
-            # Legacy format
-            cvs_collection.update_one(
-                {"user_id": ObjectId(user_id)},
-                {
-                    "$set": {
-                        section: content,
-                        "updated_at": datetime.utcnow()
-                    }
-                }
-            )
-    else:
-        # Create new CV with this section
-        new_cv = {
-            "user_id": ObjectId(user_id),
-            "sections": {section: content},
-            "created_at": datetime.utcnow(),
-            "updated_at": datetime.utcnow()
-        }
-        cvs_collection.insert_one(new_cv)
+    update_cv_sections(user_id, {section: content})
 
 @app.post("/api/register")
 async def api_register(register_request: RegisterRequest):
@@ -265,7 +460,7 @@ async def api_register(register_request: RegisterRequest):
     
     try:
         # Create user
-        user_id = create_user(
+        user_id = await create_user(
             register_request.name, 
             register_request.email, 
             register_request.password
@@ -291,7 +486,7 @@ async def api_login(login_request: LoginRequest):
     logger.debug(f"API Login attempt: {login_request.email}")
     
     # Authenticate user
-    user = authenticate_user(login_request.email, login_request.password)
+    user = await authenticate_user(login_request.email, login_request.password)
     
     if not user:
         logger.debug("API Login failed")
@@ -309,46 +504,96 @@ async def api_login(login_request: LoginRequest):
     }
 
 @app.get("/api/cv/{name}")
-async def api_get_cv(name: str, authorization: str = Header(None)):
-    """API endpoint pour récupérer les données du CV"""
-    logger.debug(f"API Get CV: {name}")
+async def api_get_cv(name: str, fields: Optional[str] = None, compact: bool = False,
+                     authorization: str = Header(None), if_none_match: str = Header(None)):
+    """
+    API endpoint pour récupérer les données du CV.
+    `fields` (liste séparée par des virgules) limite la réponse à ces champs ; la photo
+    (`image_base64`) n'est renvoyée que si elle y figure. `compact` omet aussi les
+    descriptions longues.
+    """
+    logger.debug(f"API Get CV: {name}, fields: {fields}, compact: {compact}")
+    
+    requested = [field.strip() for field in fields.split(",") if field.strip()] if fields else None
+    try:
+        projection = cv_api_projection(requested, compact)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    # Unknown profiles are answered from the negative cache
+    if name in unknown_profiles:
+        raise HTTPException(status_code=404, detail="User not found")
     
     # Get user by username
-    user = users_collection.find_one({"user_name": name})
+    user_id = find_user_id(users_collection, name)
     
-    if not user:
-        # Create a new user if not found
-        user_id = get_or_create_user_by_name(name)
-    else:
-        user_id = str(user["_id"])
+    if not user_id:
+        unknown_profiles.set(name)
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    # Get only the requested CV fields from MongoDB
+    cv_doc = find_cv(cvs_collection, user_id, projection)
     
-    # Get CV data from MongoDB
-    cv_doc = cvs_collection.find_one({"user_id": ObjectId(user_id)})
+    # The CV version (updated_at) and the requested fieldset identify the response
+    updated_at = cv_doc.get("updated_at") if cv_doc else None
+    etag = make_etag(name, updated_at, "api", ",".join(sorted(requested or [])), compact)
+    headers = {"ETag": etag, **REVALIDATE_HEADERS}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
     
-    result = {"name": name}
+    result = {"name": name, "version": cv_version(updated_at)}
     
     if cv_doc and "sections" in cv_doc:
         cv = cv_doc["sections"]
         
+        mapped = {}
+        
         # Map MongoDB document structure to API response
         if "first_name" in cv and "last_name" in cv:
-            result["header"] = f"{cv['first_name']} {cv['last_name']}"
+            mapped["header"] = f"{cv['first_name']} {cv['last_name']}"
         elif "first_name" in cv:
-            result["header"] = cv['first_name']
+            mapped["header"] = cv['first_name']
         elif "last_name" in cv:
-            result["header"] = cv['last_name']
+            mapped["header"] = cv['last_name']
         
         # Add all fields that exist
-        for field in ["email", "phone", "address", "summary", "skills", "education", "work_experience", "projects", "hobbies", "languages", "certifications", "driving_license"]:
+        for field in ["first_name", "last_name", "job_title", "email", "phone", "address", "summary", "skills", "education", "work_experience", "projects", "hobbies", "languages", "certifications", "driving_license"]:
             if field in cv and cv[field]:
                 if field == "address":
-                    result["location"] = cv[field]
+                    mapped["location"] = cv[field]
                 elif field == "summary":
-                    result["section1"] = cv[field]
+                    mapped["section1"] = cv[field]
                 else:
-                    result[field] = cv[field]
+                    mapped[field] = cv[field]
+        
+        # The photo is stored either as a base64 string or as {"image_base64": ...}
+        image = cv.get("image_base64") or cv.get("image")
+        if isinstance(image, dict):
+            image = image.get("image_base64")
+        if image:
+            mapped["image_base64"] = image
+        
+        # Derived fields (header) only appear when they were asked for
+        result.update({key: value for key, value in mapped.items() if requested is None or key in requested})
+    
+    return FastJSONResponse(content=result, headers=headers)
+@app.get("/api/cv/{name}/stats")
+async def api_get_cv_stats(name: str, days: int = 30, authorization: str = Header(None)):
+    """API endpoint pour récupérer les statistiques de vues de la page publique (propriétaire uniquement)"""
+    logger.debug(f"API Get CV stats: {name}, days: {days}")
+    
+    # Extract session token from Authorization header
+    session_token = None
+    if authorization and authorization.startswith("Bearer "):
+        session_token = authorization[7:]  # Remove "Bearer " prefix
+    
+    # Check authorization - only page owner can see the stats
+    if not session_token or not is_page_owner(session_token, name):
+        raise HTTPException(status_code=403, detail="You don't have permission to see these statistics")
     
-    return result
+    days = min(max(days, 1), 365)
+    return view_stats(profile_views_collection, name, days)
+
 @app.post("/api/cv/{name}/update")
 async def api_update_cv(name: str, update_data: CVUpdateRequest, authorization: str = Header(None)):
     """API endpoint pour mettre à jour une section du CV"""
@@ -364,23 +609,98 @@ async def api_update_cv(name: str, update_data: CVUpdateRequest, authorization:
         raise HTTPException(status_code=403, detail="You don't have permission to edit this page")
     
     # Get user id
-    user = users_collection.find_one({"user_name": name})
+    user_id = find_user_id(users_collection, name)
     
-    if not user:
+    if not user_id:
         raise HTTPException(status_code=404, detail="User not found")
     
-    user_id = str(user["_id"])
+    user_id = str(user_id)
     
     # Update content
     update_cv_section(user_id, update_data.section, update_data.content)
+    after_cv_write(name)
     
     return {"status": "success"}
 
+@app.patch("/api/cv/{name}")
+async def api_patch_cv(name: str, patch_data: CVPatchRequest, authorization: str = Header(None)):
+    """API endpoint pour mettre à jour plusieurs sections du CV en une seule écriture (409 si `expected_version` n'est plus la version courante)"""
+    logger.debug(f"API Patch CV: {name}, Sections: {list(patch_data.sections)}")
+    
+    # Extract session token from Authorization header
+    session_token = None
+    if authorization and authorization.startswith("Bearer "):
+        session_token = authorization[7:]  # Remove "Bearer " prefix
+    
+    # Check authorization - only page owner can update
+    if not session_token or not is_page_owner(session_token, name):
+        raise HTTPException(status_code=403, detail="You don't have permission to edit this page")
+    
+    if not patch_data.sections:
+        raise HTTPException(status_code=400, detail="No sections to update")
+    
+    # The client sends the version it edited: a concurrent write is a conflict
+    expected_version = None
+    if patch_data.expected_version:
+        try:
+            expected_version = parse_cv_version(patch_data.expected_version)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid expected_version")
+    
+    # Get user id
+    user_id = find_user_id(users_collection, name)
+    
+    if not user_id:
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    # Apply all changes atomically
+    updated_at = update_cv_sections(str(user_id), patch_data.sections, expected_version)
+    after_cv_write(name)
+    
+    return {"status": "success", "updated": list(patch_data.sections), "version": cv_version(updated_at)}
+
+@app.post("/api/cv/{name}/image")
+async def api_upload_image(name: str, file: UploadFile = File(...), authorization: str = Header(None)):
+    """API endpoint pour remplacer la photo de profil (multipart, stockée en JPEG réduit)"""
+    logger.debug(f"API Upload image: {name}")
+    
+    # Extract session token from Authorization header
+    session_token = None
+    if authorization and authorization.startswith("Bearer "):
+        session_token = authorization[7:]  # Remove "Bearer " prefix
+    
+    # Check authorization - only page owner can change the photo
+    if not session_token or not is_page_owner(session_token, name):
+        raise HTTPException(status_code=403, detail="You don't have permission to edit this CV")
+    
+    user_id = find_user_id(users_collection, name)
+    if not user_id:
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    data = await file.read(MAX_IMAGE_UPLOAD_BYTES + 1)
+    if len(data) > MAX_IMAGE_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail="Image too large")
+    
+    # Decoding and resizing are CPU-bound: keep them off the event loop
+    try:
+        loop = asyncio.get_running_loop()
+        image = await loop.run_in_executor(None, avatar_base64, data)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    update_cv_sections(str(user_id), {"image_base64": image})
+    after_cv_write(name)
+    
+    return {"status": "success", "size": len(image)}
 
 
-@app.post("/api/cv/{name}/upload")
+
+@app.post("/api/cv/{name}/upload", status_code=202)
 async def api_upload_cv(name: str, file: UploadFile = File(...), authorization: str = Header(None)):
-    """API endpoint for uploading and processing a CV file"""
+    """
+    API endpoint for uploading a CV file.
+    Processing runs in the background: the response carries the job to poll.
+    """
     logger.debug(f"API Upload CV: {name}")
     
     # Extract session token from Authorization header
@@ -393,167 +713,61 @@ async def api_upload_cv(name: str, file: UploadFile = File(...), authorization:
         raise HTTPException(status_code=403, detail="You don't have permission to upload for this user")
     
     # Get user
-    user = users_collection.find_one({"user_name": name})
+    user = find_user_profile(users_collection, {"user_name": name})
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    user_id = str(user["_id"])
-
-    # Save the file temporarily
-    with tempfile.NamedTemporaryFile(delete=False, suffix=f".{file.filename.split('.')[-1].lower()}") as temp_file:
-        contents = await file.read()
-        temp_file.write(contents)
-        temp_path = temp_file.name
-
-    try:
-        file_extension = file.filename.split('.')[-1].lower()
-        ocr_text_original, ocr_text_clean = "", ""
-        first_image = None
-
-        if file_extension == 'pdf':
-            cleaned_pdf_path = f"{temp_path}_cleaned.pdf"
-
-            # Remove background for B&W version
-            remove_background_from_pdf(temp_path, cleaned_pdf_path)
-            
-            try:
-                # Extract text from original PDF
-                ocr_result_original = extract_text_and_first_image_from_pdf(temp_path, user["email"])
-                ocr_text_original = ocr_result_original["markdown"]
-                first_image = ocr_result_original["image"]
-            
-            except Exception as e:
-                logger.error(f"Error extracting OCR from original PDF: {e}")
-                ocr_text_original = ""
-                first_image = None
-
-            try:
-                # Extract text from cleaned B&W PDF
-                ocr_text_clean = extract_text_from_pdf(cleaned_pdf_path)
-            except Exception as e:
-                logger.error(f"Error extracting OCR from cleaned PDF: {e}")
-                ocr_text_clean = ""
-            
-            # If both extraction methods failed, convert PDF to image and try again
-            if not ocr_text_original and not ocr_text_clean:
-                logger.info("Both PDF extraction methods failed. Converting PDF to image for OCR...")
-                try:
-                    
-                    
-                    # Convert PDF to images
-                    with tempfile.TemporaryDirectory() as path:
-                        images = convert_from_path(temp_path, output_folder=path)
-                        if images:
-                            # Save first page as image
-                            img_path = f"{path}/page_0.jpg"
-                            images[0].save(img_path, 'JPEG')
-                            
-                            # Extract text from the image
-                            ocr_text_original = extract_text_from_image(img_path)
-                            
-                            # Get image as base64 for profile picture
-                            if not first_image:
-                                import base64
-                                with open(img_path, "rb") as img_file:
-                                    first_image = base64.b64encode(img_file.read()).decode('utf-8')
-                except Exception as e:
-                    logger.error(f"Error extracting OCR from PDF converted to image: {e}")
-            
-            # Clean up temporary cleaned PDF
-            try:
-                os.unlink(cleaned_pdf_path)
-            except:
-                pass
-
-        elif file_extension in ['jpg', 'jpeg', 'png']:
-            try:
-                ocr_text_original = extract_text_from_image(temp_path)
-                
-                # For image files, convert the image to base64 for profile picture
-                with open(temp_path, "rb") as image_file:
-                    import base64
-                    first_image = base64.b64encode(image_file.read()).decode('utf-8')
-            except Exception as e:
-                logger.error(f"Error extracting OCR from image: {e}")
-        
-        else:
-            raise HTTPException(status_code=400, detail="Unsupported file format")
-
-        # Combine texts from both versions
-        text_total = f"""
-        --- OCR FROM ORIGINAL PDF ---
-        {ocr_text_original}
+    extension = file_extension(file.filename)
+    if extension not in SUPPORTED_EXTENSIONS:
+        raise HTTPException(status_code=400, detail="Unsupported file format")
+    
+    # This instance is shutting down: the client retries on another one
+    if app.state.draining:
+        raise HTTPException(status_code=503, detail="Server is restarting, please retry", headers={"Retry-After": "5"})
 
-        --- OCR FROM CLEANED PDF ---
-        {ocr_text_clean}
-        """
+    contents = await file.read(MAX_CV_UPLOAD_BYTES + 1)
+    if len(contents) > MAX_CV_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail="File too large")
 
-        # Structure CV data with LLM with retry logic for rate limits
-        max_retries = 5
-        retry_delay = 2  # Start with 2 seconds delay
-        
-        for attempt in range(max_retries):
-            try:
-                logger.debug(f"Attempt {attempt+1}/{max_retries} to process CV with LLM")
-                cv_data = structure_cv_json(text_total)
-                
-                # Store the image in the CV data
-                if first_image:
-                    if isinstance(first_image, dict) and "image_base64" in first_image:
-                        cv_data["image_base64"] = first_image["image_base64"]
-                    else:
-                        cv_data["image_base64"] = first_image
-                
-                break  # Success, exit retry loop
-            except Exception as e:
-                if "429" in str(e) and attempt < max_retries - 1:
-                    wait_time = retry_delay * (2 ** attempt)  # Exponential backoff
-                    logger.warning(f"Rate limited by API (429). Waiting {wait_time} seconds before retry...")
-                    await asyncio.sleep(wait_time)
-                else:
-                    # If we've exhausted all retries or it's not a rate limit error
-                    raise
-        
-        # Update CV sections with extracted data
-        cv = cvs_collection.find_one({"user_id": ObjectId(user_id)})
-        
-        if not cv:
-            # Create new CV document
-            cv_data = {
-                "user_id": ObjectId(user_id),
-                "sections": cv_data,
-                "created_at": datetime.utcnow(),
-                "updated_at": datetime.utcnow()
-            }
-            cvs_collection.insert_one(cv_data)
-        else:
-            # Update existing CV document with all sections
-            cvs_collection.update_one(
-                {"_id": cv["_id"]},
-                {
-                    "$set": {
-                        "sections": cv_data,
-                        "updated_at": datetime.utcnow()
-                    }
-                }
-            )
-        
-        return {"status": "success", "message": "CV processed successfully"}
+    # The job carries the file: any pipeline worker can process it
+    job_id = create_job(upload_jobs_collection, name, user["_id"], user["email"], file.filename, extension, contents)
     
-    except Exception as e:
-        logger.error(f"Error processing CV: {e}")
-        if "429" in str(e):
-            raise HTTPException(status_code=429, detail="The service is currently experiencing high traffic. Please try again in a few minutes.")
-        else:
-            raise HTTPException(status_code=500, detail=f"Error processing CV: {str(e)}")
-    
-    finally:
-        # Clean up the temporary file
-        try:
-            os.unlink(temp_path)
-        except:
-            pass
+    return {
+        "status": "accepted",
+        "job_id": str(job_id),
+        "status_url": f"/api/cv/{name}/upload/{job_id}",
+    }
 
+@app.get("/api/cv/{name}/upload/{job_id}")
+async def api_upload_status(name: str, job_id: str, authorization: str = Header(None)):
+    """API endpoint pour suivre le traitement d'un CV envoyé"""
+    # Extract session token from Authorization header
+    session_token = None
+    if authorization and authorization.startswith("Bearer "):
+        session_token = authorization[7:]  # Remove "Bearer " prefix
+    
+    # Check authorization - only page owner can follow the upload
+    if not session_token or not is_page_owner(session_token, name):
+        raise HTTPException(status_code=403, detail="You don't have permission to see this upload")
+    
+    job = find_job(upload_jobs_collection, job_id, name)
+    if not job:
+        raise HTTPException(status_code=404, detail="Upload job not found")
+    
+    # The CV may have been saved by another process: one web process refreshes
+    # the caches and snapshots of this user
+    if job["status"] == STATUS_DONE and claim_refresh(upload_jobs_collection, job["_id"]):
+        after_cv_write(name)
+    
+    return {
+        "job_id": str(job["_id"]),
+        "status": job["status"],
+        "stage": job["stage"],
+        "stages": list(STAGES),
+        "attempts": job.get("attempts", 0),
+        "error": job["error"],
+        "updated_at": job["updated_at"],
+    }
 
 @app.delete("/api/cv/{name}/delete")
 async def api_delete_cv(name: str, authorization: str = Header(None)):
@@ -570,12 +784,12 @@ async def api_delete_cv(name: str, authorization: str = Header(None)):
         raise HTTPException(status_code=403, detail="You don't have permission to delete this CV")
     
     # Get user
-    user = users_collection.find_one({"user_name": name})
+    user_id = find_user_id(users_collection, name)
     
-    if not user:
+    if not user_id:
         raise HTTPException(status_code=404, detail="User not found")
     
-    user_id = str(user["_id"])
+    user_id = str(user_id)
     
     # Delete the CV document
     result = cvs_collection.delete_one({"user_id": ObjectId(user_id)})
@@ -590,210 +804,114 @@ async def api_delete_cv(name: str, authorization: str = Header(None)):
         "is_deleted": True  # Mark as deleted
     }
     cvs_collection.insert_one(default_cv)
+    after_cv_write(name)
     
     if result.deleted_count > 0:
         return {"status": "success", "message": "CV deleted successfully"}
     else:
         return {"status": "info", "message": "No CV found to delete"}
+# Registered before /user/{name}, which would otherwise match "<name>.pdf"
+@app.get("/users/{name}.pdf")
+@app.get("/user/{name}.pdf")
+async def user_pdf(request: Request, name: str, theme: str = None):
+    """PDF export of a public CV, cached until the CV changes"""
+    logger.debug(f"PDF export requested for name: {name}, theme: {theme}")
+    
+    if name in unknown_profiles:
+        return HTMLResponse(content=NOT_FOUND_PAGE, status_code=404)
+    
+    page = find_public_page(users_collection, cvs_collection, sessions_collection, name)
+    
+    if not page:
+        unknown_profiles.set(name)
+        return HTMLResponse(content=NOT_FOUND_PAGE, status_code=404)
+    
+    cv_doc = page.get("cv") or {}
+    template_name = template_name_for(theme)
+    etag = make_etag(name, template_name, cv_doc.get("updated_at"), "pdf", TEMPLATES_VERSION, ASSETS_VERSION)
+    headers = {
+        "ETag": etag,
+        "Content-Disposition": f"inline; filename*=UTF-8''{quote(name, safe='')}.pdf",
+        **REVALIDATE_HEADERS,
+    }
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    
+    cache_key = (name, template_name, cv_doc.get("updated_at"))
+    content = rendered_pdfs.get(cache_key)
+    
+    if content is None:
+        try:
+            content = await render_cv_pdf(name, template_name, cv_doc.get("sections"))
+        except Exception as e:
+            logger.error(f"Error exporting PDF for {name}: {e}", exc_info=True)
+            raise HTTPException(status_code=500, detail="Error generating PDF")
+        rendered_pdfs.set(cache_key, content)
+    
+    return Response(content=content, media_type="application/pdf", headers=headers)
+
 @app.get("/users/{name}", response_class=HTMLResponse)
 @app.get("/user/{name}", response_class=HTMLResponse)
 async def user_page(request: Request, name: str, theme: str = None):
     logger.debug(f"User page accessed for name: {name}, theme: {theme}")
     try:
-        # Get user by username
-        user = users_collection.find_one({"user_name": name})
+        # Unknown profiles are answered from the negative cache
+        if name in unknown_profiles:
+            return HTMLResponse(content=NOT_FOUND_PAGE, status_code=404)
+        
+        session_token = request.cookies.get("session_token")
+        
+        # Anonymous visitors get the precompressed snapshot when one exists
+        if STATIC_SNAPSHOTS and not session_token:
+            snapshot = find_snapshot(SNAPSHOT_DIR, name, theme, request.headers.get("accept-encoding", ""),
+                                     version=SNAPSHOTS_VERSION)
+            if snapshot:
+                path, encoding = snapshot
+                headers = {"Vary": "Accept-Encoding, Cookie", **REVALIDATE_HEADERS}
+                if encoding:
+                    headers["Content-Encoding"] = encoding
+                view_counter.record(name, resolve_theme(theme))
+                # The ETag comes from the file (mtime and size), so a rewritten snapshot changes it
+                response = FileResponse(path, media_type="text/html; charset=utf-8", headers=headers,
+                                        stat_result=os.stat(path))
+                if etag_matches(request.headers.get("if-none-match"), response.headers["etag"]):
+                    return Response(status_code=304, headers={"ETag": response.headers["etag"], **headers})
+                return response
         
-        if not user:
-            user_id = get_or_create_user_by_name(name)
-        else:
-            user_id = str(user["_id"])
+        # User, CV content and session owner in a single round trip
+        page = find_public_page(users_collection, cvs_collection, sessions_collection, name, session_token)
         
-        # Get CV content
-        cv_doc = cvs_collection.find_one({"user_id": ObjectId(user_id)})
+        if not page:
+            unknown_profiles.set(name)
+            return HTMLResponse(content=NOT_FOUND_PAGE, status_code=404)
+        
+        cv_doc = page.get("cv") or {}
+        current_user_name = page.get("current_user_name") or ""
         
         # Check if current user is the owner of the page
-        session_token = request.cookies.get("session_token")
-        is_owner = False
-        current_user = None
-        current_user_name = ""
+        is_owner = current_user_name == name
+        logged_in = bool(current_user_name)
         
-        if session_token:
-            current_user = get_user_from_session(session_token)
-            if current_user:
-                current_user_name = current_user["name"]
-                is_owner = current_user["name"] == name
+        # Owners looking at their own page are not counted
+        if not is_owner:
+            view_counter.record(name, resolve_theme(theme))
         
-        # Prepare template data with base info
-        template_data = {
-            "request": request,
-            "name": name,
-            "SERVER_URL": SERVER_URL,
-            "CLIENT_URL": CLIENT_URL,
-            "is_owner": is_owner,
-            "logged_in": current_user is not None,
-            "current_user_name": current_user_name,
-            # Pass the entire CV document as cv
-            "cv": cv_doc["sections"] if cv_doc and "sections" in cv_doc else {}
-        }
+        # Browsers and crawlers revalidate with the ETag of the CV version
+        template_name = template_name_for(theme)
+        etag = make_etag(name, template_name, cv_doc.get("updated_at"), is_owner, logged_in, TEMPLATES_VERSION, ASSETS_VERSION)
+        headers = {"ETag": etag, "Vary": "Cookie", **REVALIDATE_HEADERS}
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
         
-        # Also add the traditional data format for backwards compatibility
-        if cv_doc and "sections" in cv_doc:
-            cv = cv_doc["sections"]
-            
-            # Map MongoDB document structure to template fields
-            
-       # Header (full name)
-            if "first_name" in cv and "last_name" in cv:
-                template_data["header"] = f"{cv['first_name']} {cv['last_name']}"
-            elif "first_name" in cv:
-                template_data["header"] = cv['first_name']
-            elif "last_name" in cv:
-                template_data["header"] = cv['last_name']
-            else:
-                template_data["header"] = name
-
-            if "image" in cv:
-                img = cv["image"]
-                if img and isinstance(img, dict) and "image_base64" in img:
-                    template_data["cv"]["image_base64"] = img["image_base64"]
-                elif img and isinstance(img, str):
-                    # Si l'image est déjà une chaîne base64
-                    template_data["cv"]["image_base64"] = img
-                else:
-                    # S'assurer que template_data["cv"] existe
-                    if "cv" not in template_data:
-                        template_data["cv"] = {}
-                    template_data["cv"]["image_base64"] = None
-            elif "image_base64" in cv:  # Vérifier aussi directement pour image_base64
-                template_data["cv"] = template_data.get("cv", {})
-                template_data["cv"]["image_base64"] = cv["image_base64"]
-
-                
-            # Section 1 (About)
-            if "summary" in cv:
-                template_data["section1"] = cv["summary"]
-                
-            # Contact information
-            if "email" in cv:
-                template_data["email"] = cv["email"]
-                
-            if "phone" in cv:
-                template_data["phone"] = cv["phone"]
-                
-            if "address" in cv:
-                template_data["location"] = cv["address"]
-            
-            # Professional title
-            if "job_title" in cv and cv["job_title"]:
-                template_data["title"] = cv["job_title"]
-            elif "work_experience" in cv and cv["work_experience"] and len(cv["work_experience"]) > 0:
-                template_data["title"] = cv["work_experience"][0]["job_title"]
-            
-            # Work Experience
-            if "work_experience" in cv and cv["work_experience"]:
-                experience_html = ""
-                for exp in cv["work_experience"]:
-                    experience_html += f'''
-                    <div class="timeline-item">
-                        <div class="date">{exp.get("duration", "")}</div>
-                        <h3 class="timeline-title">{exp.get("job_title", "")}</h3>
-                        <div class="organization">{exp.get("company", "")}</div>
-                        <p class="description">{exp.get("description", "")}</p>
-                    </div>
-                    '''
-                template_data["experience"] = experience_html
-            
-            # Education
-            if "education" in cv and cv["education"]:
-                education_html = ""
-                for edu in cv["education"]:
-                    education_html += f'''
-                    <div class="timeline-item">
-                        <div class="date">{edu.get("year", "")}</div>
-                        <h3 class="timeline-title">{edu.get("degree", "")}</h3>
-                        <div class="organization">{edu.get("school", "")}</div>
-                        <p class="description">{edu.get("details", "")}</p>
-                    </div>
-                    '''
-                template_data["education"] = education_html
-            
-            # Skills
-            if "skills" in cv and cv["skills"]:
-                skills_html = ""
-                for skill in cv["skills"]:
-                    skills_html += f'<div class="skill-tag">{skill}</div>\n'
-                template_data["skills"] = skills_html
-            
-            # Languages
-            languages_html = ""
-            if "languages" in cv and cv["languages"]:
-                languages_html += '<div class="languages-list">\n'
-                for lang, level in cv["languages"].items():
-                    languages_html += f'''
-                    <div class="language-item">
-                        <span class="language-name">{lang}</span>
-                        <span class="language-level">({level})</span>
-                    </div>
-                    '''
-                languages_html += '</div>\n'
-            
-            # Hobbies
-            hobbies_html = ""
-            if "hobbies" in cv and cv["hobbies"]:
-                hobbies_html += '<div class="hobbies-list">\n'
-                for hobby in cv["hobbies"]:
-                    hobbies_html += f'''
-                    <div class="hobby-item">
-                        <span>{hobby}</span>
-                    </div>
-                    '''
-                hobbies_html += '</div>\n'
-            # Certifications
-            certifications_html = ""
-            if "certifications" in cv and cv["certifications"]:
-                certifications_html += '<div class="certifications-list">\n'
-                for cert in cv["certifications"]:
-                    certifications_html += f'<div class="certification-item">{cert}</div>\n'
-                certifications_html += '</div>\n'
-            
-            # Combine languages, hobbies, certifications into section2
-            combined_html = ""
-            if languages_html:
-                combined_html += f'<h3 class="subsection-title">Langues</h3>\n{languages_html}\n'
-            if hobbies_html:
-                combined_html += f'<h3 class="subsection-title">Centres d\'intérêt</h3>\n{hobbies_html}\n'
-            if certifications_html:
-                combined_html += f'<h3 class="subsection-title">Certifications</h3>\n{certifications_html}\n'
-            
-            if combined_html:
-                template_data["section2"] = combined_html
-            
-            # Projects (if any)
-            if "projects" in cv and cv["projects"]:
-                projects_html = ""
-                for project in cv["projects"]:
-                    projects_html += f'''
-                    <div class="project-item">
-                        <h3 class="project-title">{project.get("title", "")}</h3>
-                        <div class="project-type">{project.get("type", "")}</div>
-                        <p class="project-description">{project.get("description", "")}</p>
-                    </div>
-                    '''
-                template_data["projects"] = projects_html
-                
-            # Other potential sections
-            if "driving_license" in cv and cv["driving_license"]:
-                template_data["driving_license"] = cv["driving_license"]
-                
-        # Select template based on theme
-        if theme == "ats":
-            template_name = "user_template_ats.html"
-        elif theme == "cyberpunk":
-            template_name = "user_template_cyberpunk.html"
-        else:
-            template_name = "user_template.html"
+        # Serve from the rendered-page cache until the CV changes
+        cache_key = (name, template_name, cv_doc.get("updated_at"), is_owner, logged_in)
+        content = rendered_pages.get(cache_key)
         
-        return templates.TemplateResponse(template_name, template_data)
+        if content is None:
+            content = render_cv_page(name, template_name, cv_doc.get("sections"), is_owner, logged_in)
+            rendered_pages.set(cache_key, content)
+        
+        return HTMLResponse(content=content, headers=headers)
         
     except Exception as e:
         logger.error(f"Error serving user page: {e}", exc_info=True)
@@ -828,7 +946,7 @@ async def login(
     logger.debug("Login attempt")
     
     # Authenticate user
-    user = authenticate_user(email, password)
+    user = await authenticate_user(email, password)
     
     if not user:
         logger.debug("Login failed")
@@ -886,7 +1004,7 @@ async def register(
     
     try:
         # Create user
-        user_id = create_user(name, email, password)
+        user_id = await create_user(name, email, password)
         
         # Create session
         session_token = create_session(str(user_id))
@@ -921,6 +1039,54 @@ async def logout():
     
     return response
 
+def readiness_report() -> dict:
+    """Check MongoDB, the upload queue and recent OCR/LLM calls (blocking)"""
+    mongo = mongo_status(client)
+    queue = None
+    if mongo["ok"]:
+        try:
+            queue = queue_status(upload_jobs_collection)
+        except Exception as e:
+            mongo = {"ok": False, "error": str(e)}
+    return {"mongo": mongo, "queue": queue, "providers": provider_stats.summary()}
+
+@app.get("/healthz")
+async def healthz():
+    """Liveness: the process answers requests. Dependencies are not checked,
+    so that an outage of MongoDB does not get every instance restarted"""
+    return {"status": "ok"}
+
+@app.get("/readyz")
+async def readyz(strict: bool = False):
+    """
+    Readiness: 503 while shutting down or when MongoDB is unreachable.
+    A late upload queue or a failing provider only reports "degraded" (200),
+    unless ?strict=true, since every instance shares them
+    """
+    if app.state.draining:
+        return FastJSONResponse({"status": "draining"}, status_code=503)
+
+    report = readiness_reports.get("report")
+    if report is None:
+        loop = asyncio.get_running_loop()
+        try:
+            report = await asyncio.wait_for(loop.run_in_executor(None, readiness_report), HEALTH_CHECK_TIMEOUT)
+        except asyncio.TimeoutError:
+            report = {"mongo": {"ok": False, "error": "timeout"}, "queue": None,
+                      "providers": provider_stats.summary()}
+        readiness_reports.set("report", report)
+
+    degraded = (report["queue"] or {}).get("degraded") or any(
+        stats["degraded"] for stats in report["providers"].values()
+    )
+    if not report["mongo"]["ok"]:
+        status = "unavailable"
+    else:
+        status = "degraded" if degraded else "ok"
+    body = {**report, "status": status, "uploads_in_progress": pipeline_worker.in_progress()}
+    ready = status == "ok" or (status == "degraded" and not strict)
+    return FastJSONResponse(body, status_code=200 if ready else 503)
+
 @app.get("/test", response_class=HTMLResponse)
 async def test(request: Request):
     logger.debug("Test endpoint accessed")
@@ -928,9 +1094,7 @@ async def test(request: Request):
 
 
 if __name__ == "__main__":
-    # Get port from environment variable or use default
-    port = int(os.getenv("PORT", 8000))
-    # Use 0.0.0.0 to listen on all interfaces in cloud environments
-    host = os.getenv("HOST", "0.0.0.0")
-    logger.info(f"Starting server on {host}:{port}")
-    uvicorn.run("api:app", host=host, port=port, log_level="info")
\ No newline at end of file
+    # Production workers are started by serve.py: run through this file, each
+    # spawned worker would import api.py twice (as __mp_main__ and as api)
+    from serve import main
+    main()
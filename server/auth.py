@@ -1,13 +1,13 @@
 import hashlib
 import os
 import uuid
-import bcrypt
 from datetime import datetime, timedelta
 from typing import Optional
 from fastapi import HTTPException, Request
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
 from pymongo import MongoClient
 from bson import ObjectId
+from modules.passwords import hash_password_async, verify_password_async, needs_rehash
 
 security = HTTPBasic()
 
@@ -18,23 +18,7 @@ db = client["Challenge_SISE"]
 users_collection = db["users"]      # Collection of users
 sessions_collection = db["sessions"]  # Collection for sessions
 
-def hash_password(password: str) -> str:
-    """Hash a password for storing using bcrypt"""
-    salt = bcrypt.gensalt()
-    hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
-    return hashed.decode('utf-8')
-
-def verify_password(stored_password: str, provided_password: str) -> bool:
-    """Verify a stored password against one provided by user using bcrypt"""
-    if not stored_password or not provided_password:
-        return False
-        
-    try:
-        return bcrypt.checkpw(provided_password.encode('utf-8'), stored_password.encode('utf-8'))
-    except Exception:
-        return False
-
-def create_user(name: str, email: str, password: str) -> str:
+async def create_user(name: str, email: str, password: str) -> str:
     """Create a new user in MongoDB"""
     # Check if user already exists
     if users_collection.find_one({"email": email}):
@@ -45,7 +29,7 @@ def create_user(name: str, email: str, password: str) -> str:
     # Create user
     user_data = {
         "email": email,
-        "password_hash": hash_password(password),
+        "password_hash": await hash_password_async(password),
         "user_name": name,
         "created_at": datetime.utcnow()
     }
@@ -53,13 +37,20 @@ def create_user(name: str, email: str, password: str) -> str:
     result = users_collection.insert_one(user_data)
     return str(result.inserted_id)
 
-def authenticate_user(email: str, password: str) -> Optional[dict]:
+async def authenticate_user(email: str, password: str) -> Optional[dict]:
     """Authenticate user credentials"""
     user = users_collection.find_one({"email": email})
     
-    if not user or not verify_password(user["password_hash"], password):
+    if not user or not await verify_password_async(user["password_hash"], password):
         return None
     
+    # Upgrade the hash when the configured bcrypt cost has changed
+    if needs_rehash(user["password_hash"]):
+        users_collection.update_one(
+            {"_id": user["_id"]},
+            {"$set": {"password_hash": await hash_password_async(password)}}
+        )
+    
     return {
         "id": str(user["_id"]),
         "name": user["user_name"],
@@ -0,0 +1,79 @@
+"""
+Temps d'import et mémoire au démarrage d'un worker.
+
+Lance chaque scénario dans un processus neuf avec `python -X importtime` et
+rapporte le temps d'import total, la mémoire résidente maximale et les modules
+les plus coûteux. Le scénario « api » correspond à un worker web qui ne sert
+que des pages et des connexions ; « api + pipeline » charge en plus les
+dépendances du traitement des CV (OpenCV, PyMuPDF, pdf2image, SDK Mistral),
+comme le fait le premier upload.
+
+Usage (depuis server/) : python benchmarks/bench_imports.py [nombre de modules affichés]
+"""
+import os
+import subprocess
+import sys
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PIPELINE_IMPORTS = "import pdf2image, modules.pdf_preprocessing, modules.ocr_extraction, modules.llm_structuring"
+
+SCENARIOS = {
+    "api": "import api",
+    "api + pipeline": f"import api; {PIPELINE_IMPORTS}",
+}
+
+REPORT_RSS = "import resource; print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)"
+
+
+def parse_importtime(stderr: str) -> list:
+    """
+    Relit la sortie de `-X importtime`.
+
+    :return: Liste de (module, temps cumulé en µs, profondeur d'import)
+    """
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        entries.append((name.strip(), int(cumulative), depth))
+    return entries
+
+
+def run_scenario(code: str) -> tuple:
+    """
+    Exécute `code` dans un interpréteur neuf.
+
+    :return: (entrées importtime, RSS max en Mo)
+    """
+    env = dict(os.environ)
+    # Valeurs factices : seul l'import est mesuré, aucune connexion n'est ouverte
+    env.setdefault("MISTRAL_API_KEY", "benchmark")
+    env.setdefault("MONGO_URI", "mongodb://localhost:27017")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"{code}; {REPORT_RSS}"],
+        cwd=SERVER_DIR, env=env, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    rss_kb = int(result.stdout.strip().splitlines()[-1])
+    return parse_importtime(result.stderr), rss_kb / 1024
+
+
+def main():
+    top = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+
+    for label, code in SCENARIOS.items():
+        entries, rss_mb = run_scenario(code)
+        # Les imports de profondeur 0 couvrent tout le reste (temps cumulés)
+        total_ms = sum(cumulative for _, cumulative, depth in entries if depth == 0) / 1000
+        print(f"\n{label} : {total_ms:.0f} ms d'import, {rss_mb:.0f} Mo de RSS max")
+        print(f"{'module':<40} | {'cumulé':>10}")
+        for name, cumulative, _ in sorted(entries, key=lambda entry: -entry[1])[:top]:
+            print(f"{name:<40} | {cumulative / 1000:>7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
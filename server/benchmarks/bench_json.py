@@ -0,0 +1,64 @@
+"""
+Micro-benchmark de la sérialisation JSON des réponses de l'API.
+
+Compare, pour des CV de taille croissante, le chemin par défaut de FastAPI
+(jsonable_encoder puis json.dumps dans JSONResponse) avec FastJSONResponse
+(orjson, sans jsonable_encoder), ainsi que le parsing de la sortie du LLM.
+
+Usage (depuis server/) : python benchmarks/bench_json.py
+"""
+import base64
+import json
+import os
+import sys
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from bench_rendering import make_cv, per_call_us
+from modules import fast_json
+from modules.fast_json import FastJSONResponse
+
+
+def make_document(n: int, with_image: bool) -> dict:
+    """Document CV tel que stocké dans MongoDB (ObjectId, dates, photo optionnelle)."""
+    sections = make_cv(n)
+    if with_image:
+        sections["image_base64"] = base64.b64encode(os.urandom(150 * 1024)).decode("ascii")
+    return {
+        "_id": ObjectId(),
+        "user_id": ObjectId(),
+        "sections": sections,
+        "created_at": datetime(2024, 1, 1),
+        "updated_at": datetime.utcnow(),
+    }
+
+
+def main():
+    if fast_json.orjson is None:
+        print("orjson n'est pas installé : FastJSONResponse utilise le module json standard")
+
+    print(f"{'items':>6} | {'photo':>5} | {'taille':>9} | {'défaut FastAPI':>15} | {'FastJSONResponse':>17} | "
+          f"{'json.loads':>11} | {'fast_json.loads':>16}")
+    for n in (5, 50, 500):
+        for with_image in (False, True):
+            document = make_document(n, with_image)
+            number = max(1, 2000 // n)
+            before = per_call_us(
+                lambda: JSONResponse(jsonable_encoder(document, custom_encoder={ObjectId: str})).body, number
+            )
+            after = per_call_us(lambda: FastJSONResponse(document).body, number)
+            payload = json.dumps(document["sections"])
+            parse_before = per_call_us(lambda: json.loads(payload), number)
+            parse_after = per_call_us(lambda: fast_json.loads(payload), number)
+            size = len(FastJSONResponse(document).body)
+            print(f"{n:>6} | {'oui' if with_image else 'non':>5} | {size / 1024:>6.0f} ko | {before:>12.1f} µs | "
+                  f"{after:>14.1f} µs | {parse_before:>8.1f} µs | {parse_after:>13.1f} µs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""
+Micro-benchmark du rendu des pages publiques.
+
+Compare, pour des CV de taille croissante, la construction des sections par
+concaténation de f-strings en Python (ancienne implémentation de user_page)
+avec les macros Jinja de templates/cv_macros.html, puis mesure le rendu complet
+de chaque thème.
+
+Usage (depuis server/) : python benchmarks/bench_rendering.py
+"""
+import html
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from jinja2 import Environment, FileSystemLoader
+
+from modules.cv_rendering import build_cv_context, template_name_for
+
+TEMPLATES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "templates")
+
+
+def make_cv(n: int) -> dict:
+    """CV synthétique avec `n` éléments par liste."""
+    return {
+        "first_name": "Ada",
+        "last_name": "Lovelace",
+        "job_title": "Data Scientist",
+        "email": "ada@example.com",
+        "phone": "+33 6 00 00 00 00",
+        "address": "Lyon, France",
+        "summary": "Analyste passionnée. " * 20,
+        "work_experience": [
+            {"job_title": f"Poste {i}", "company": f"Entreprise {i}", "duration": "2020 - 2024",
+             "description": "Conception de modèles et de pipelines de données. " * 5}
+            for i in range(n)
+        ],
+        "education": [
+            {"year": 2015 + i, "school": f"Université {i}", "degree": "Master", "details": "Mention bien"}
+            for i in range(n)
+        ],
+        "skills": [f"Compétence {i}" for i in range(n)],
+        "languages": {f"Langue {i}": "C1" for i in range(n)},
+        "hobbies": [f"Loisir {i}" for i in range(n)],
+        "certifications": [f"Certification {i}" for i in range(n)],
+        "projects": [
+            {"title": f"Projet {i}", "type": "Academic", "description": "Description du projet. " * 5}
+            for i in range(n)
+        ],
+    }
+
+
+def legacy_sections(cv: dict, esc=str) -> dict:
+    """
+    Ancienne construction des sections dans user_page (concaténation de chaînes).
+    L'ancienne version n'échappait pas le contenu : `esc` = html.escape donne une base
+    de comparaison à sécurité égale avec les macros (autoescape).
+    """
+    data = {}
+    experience_html = ""
+    for exp in cv["work_experience"]:
+        experience_html += f'''
+                    <div class="timeline-item">
+                        <div class="date">{esc(exp.get("duration", ""))}</div>
+                        <h3 class="timeline-title">{esc(exp.get("job_title", ""))}</h3>
+                        <div class="organization">{esc(exp.get("company", ""))}</div>
+                        <p class="description">{esc(exp.get("description", ""))}</p>
+                    </div>
+                    '''
+    data["experience"] = experience_html
+    education_html = ""
+    for edu in cv["education"]:
+        education_html += f'''
+                    <div class="timeline-item">
+                        <div class="date">{esc(edu.get("year", ""))}</div>
+                        <h3 class="timeline-title">{esc(edu.get("degree", ""))}</h3>
+                        <div class="organization">{esc(edu.get("school", ""))}</div>
+                        <p class="description">{esc(edu.get("details", ""))}</p>
+                    </div>
+                    '''
+    data["education"] = education_html
+    skills_html = ""
+    for skill in cv["skills"]:
+        skills_html += f'<div class="skill-tag">{esc(skill)}</div>\n'
+    data["skills"] = skills_html
+    languages_html = '<div class="languages-list">\n'
+    for lang, level in cv["languages"].items():
+        languages_html += f'''
+                    <div class="language-item">
+                        <span class="language-name">{esc(lang)}</span>
+                        <span class="language-level">({esc(level)})</span>
+                    </div>
+                    '''
+    languages_html += '</div>\n'
+    hobbies_html = '<div class="hobbies-list">\n'
+    for hobby in cv["hobbies"]:
+        hobbies_html += f'''
+                    <div class="hobby-item">
+                        <span>{esc(hobby)}</span>
+                    </div>
+                    '''
+    hobbies_html += '</div>\n'
+    certifications_html = '<div class="certifications-list">\n'
+    for cert in cv["certifications"]:
+        certifications_html += f'<div class="certification-item">{esc(cert)}</div>\n'
+    certifications_html += '</div>\n'
+    combined_html = f'<h3 class="subsection-title">Langues</h3>\n{languages_html}\n'
+    combined_html += f'<h3 class="subsection-title">Centres d\'intérêt</h3>\n{hobbies_html}\n'
+    combined_html += f'<h3 class="subsection-title">Certifications</h3>\n{certifications_html}\n'
+    data["section2"] = combined_html
+    projects_html = ""
+    for project in cv["projects"]:
+        projects_html += f'''
+                    <div class="project-item">
+                        <h3 class="project-title">{esc(project.get("title", ""))}</h3>
+                        <div class="project-type">{esc(project.get("type", ""))}</div>
+                        <p class="project-description">{esc(project.get("description", ""))}</p>
+                    </div>
+                    '''
+    data["projects"] = projects_html
+    return data
+
+
+def per_call_us(func, number: int) -> float:
+    """Meilleur temps moyen d'un appel, en microsecondes."""
+    return min(timeit.repeat(func, number=number, repeat=5)) / number * 1e6
+
+
+def main():
+    env = Environment(loader=FileSystemLoader(TEMPLATES_DIR), autoescape=True)
+    env.globals["asset_url"] = lambda path: "/static/" + path
+    sections = env.from_string(
+        '{% import "cv_macros.html" as cv_macros %}'
+        "{{ cv_macros.experience_items(experience) }}{{ cv_macros.education_items(education) }}"
+        "{{ cv_macros.skill_tags(skills) }}{{ cv_macros.section2_content(section2) }}"
+        "{{ cv_macros.project_items(projects) }}"
+    )
+    base = {"name": "ada", "SERVER_URL": "", "CLIENT_URL": "", "is_owner": False, "logged_in": False}
+
+    print(f"{'items':>6} | {'f-strings (avant)':>18} | {'f-strings échappées':>20} | {'macros (après)':>15} | "
+          f"{'page standard':>14} | {'page ats':>9} | {'page cyberpunk':>15}")
+    for n in (5, 50, 500):
+        cv = make_cv(n)
+        context = {**base, **build_cv_context("ada", cv)}
+        number = max(1, 2000 // n)
+        before = per_call_us(lambda: legacy_sections(cv), number)
+        escaped = per_call_us(lambda: legacy_sections(cv, lambda value: html.escape(str(value))), number)
+        after = per_call_us(lambda: sections.render(context), number)
+        pages = [
+            per_call_us(lambda t=env.get_template(template_name_for(theme)): t.render(context), number)
+            for theme in (None, "ats", "cyberpunk")
+        ]
+        print(f"{n:>6} | {before:>15.1f} µs | {escaped:>17.1f} µs | {after:>12.1f} µs | "
+              f"{pages[0]:>11.1f} µs | {pages[1]:>6.1f} µs | {pages[2]:>12.1f} µs")
+
+
+if __name__ == "__main__":
+    main()
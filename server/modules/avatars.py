@@ -0,0 +1,47 @@
+import base64
+from io import BytesIO
+
+# 📌 Photo de profil : côté maximal (px) et qualité JPEG de la version stockée
+AVATAR_MAX_SIZE = 512
+AVATAR_JPEG_QUALITY = 85
+
+
+def normalize_avatar(data: bytes, max_size: int = AVATAR_MAX_SIZE, quality: int = AVATAR_JPEG_QUALITY) -> bytes:
+    """
+    Oriente (EXIF), réduit et recompresse une photo de profil en JPEG.
+
+    :param data: Image d'origine (tout format lu par Pillow)
+    :param max_size: Côté maximal en pixels
+    :param quality: Qualité JPEG
+    :return: Image JPEG
+    :raise ValueError: si les données ne sont pas une image lisible
+    """
+    from PIL import Image, ImageOps  # 📌 Import paresseux : Pillow n'est chargé qu'au premier envoi
+
+    try:
+        image = Image.open(BytesIO(data))
+        # 📌 Pour un JPEG, décode directement à une résolution réduite
+        image.draft("RGB", (max_size, max_size))
+        image = ImageOps.exif_transpose(image)
+    except (OSError, Image.DecompressionBombError) as e:
+        raise ValueError(f"Invalid image: {e}")
+
+    image.thumbnail((max_size, max_size), Image.LANCZOS)
+
+    if image.mode in ("RGBA", "LA", "P"):
+        # Transparence aplatie sur fond blanc (le JPEG n'a pas de canal alpha)
+        image = image.convert("RGBA")
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel("A"))
+        image = background
+    elif image.mode != "RGB":
+        image = image.convert("RGB")
+
+    output = BytesIO()
+    image.save(output, "JPEG", quality=quality, optimize=True, progressive=True)
+    return output.getvalue()
+
+
+def avatar_base64(data: bytes) -> str:
+    """Photo normalisée, encodée en base64 comme les autres photos de `sections`."""
+    return base64.b64encode(normalize_avatar(data)).decode("ascii")
@@ -0,0 +1,153 @@
+import base64
+import logging
+import os
+import tempfile
+import threading
+import time
+
+# 📌 Les dépendances lourdes (OpenCV, PyMuPDF, pdf2image, SDK Mistral) sont importées
+# dans les fonctions : un worker web qui ne traite pas d'upload ne les charge jamais.
+
+logger = logging.getLogger(__name__)
+
+# PyMuPDF n'est pas thread-safe : un seul prétraitement à la fois par processus
+_PYMUPDF_LOCK = threading.Lock()
+
+# 📌 Étapes du traitement d'un CV, dans l'ordre (suivies par le client pendant l'upload)
+STAGES = ("preprocessing", "ocr", "structuring", "saving")
+SUPPORTED_EXTENSIONS = ("pdf", "jpg", "jpeg", "png")
+
+
+def file_extension(filename: str) -> str:
+    """Extension en minuscules d'un nom de fichier (sans le point)."""
+    return filename.split('.')[-1].lower()
+
+
+def _no_progress(stage: str):
+    pass
+
+
+def extract_cv_text(file_path: str, extension: str, user_email: str, progress=_no_progress):
+    """
+    Prétraite le fichier et en extrait le texte par OCR, ainsi que la photo de profil.
+
+    :param file_path: Chemin du fichier envoyé
+    :param extension: Extension du fichier (voir SUPPORTED_EXTENSIONS)
+    :param user_email: Email de l'utilisateur
+    :param progress: Fonction appelée avec le nom de chaque étape commencée
+    :return: (texte OCR combiné, image base64 ou None)
+    """
+    from pdf2image import convert_from_path
+
+    from .ocr_extraction import extract_text_and_first_image_from_pdf, extract_text_from_pdf, extract_text_from_image
+    from .pdf_preprocessing import remove_background_from_pdf
+
+    ocr_text_original, ocr_text_clean = "", ""
+    first_image = None
+
+    if extension == 'pdf':
+        progress("preprocessing")
+        cleaned_pdf_path = f"{file_path}_cleaned.pdf"
+
+        # Remove background for B&W version
+        with _PYMUPDF_LOCK:
+            remove_background_from_pdf(file_path, cleaned_pdf_path)
+
+        progress("ocr")
+        try:
+            # Extract text from original PDF
+            ocr_result_original = extract_text_and_first_image_from_pdf(file_path, user_email)
+            ocr_text_original = ocr_result_original["markdown"]
+            first_image = ocr_result_original["image"]
+
+        except Exception as e:
+            logger.error(f"Error extracting OCR from original PDF: {e}")
+            ocr_text_original = ""
+            first_image = None
+
+        try:
+            # Extract text from cleaned B&W PDF
+            ocr_text_clean = extract_text_from_pdf(cleaned_pdf_path)
+        except Exception as e:
+            logger.error(f"Error extracting OCR from cleaned PDF: {e}")
+            ocr_text_clean = ""
+
+        # If both extraction methods failed, convert PDF to image and try again
+        if not ocr_text_original and not ocr_text_clean:
+            logger.info("Both PDF extraction methods failed. Converting PDF to image for OCR...")
+            try:
+                # Convert PDF to images
+                with tempfile.TemporaryDirectory() as path:
+                    images = convert_from_path(file_path, output_folder=path)
+                    if images:
+                        # Save first page as image
+                        img_path = f"{path}/page_0.jpg"
+                        images[0].save(img_path, 'JPEG')
+
+                        # Extract text from the image
+                        ocr_text_original = extract_text_from_image(img_path)
+
+                        # Get image as base64 for profile picture
+                        if not first_image:
+                            with open(img_path, "rb") as img_file:
+                                first_image = base64.b64encode(img_file.read()).decode('utf-8')
+            except Exception as e:
+                logger.error(f"Error extracting OCR from PDF converted to image: {e}")
+
+        # Clean up temporary cleaned PDF
+        try:
+            os.unlink(cleaned_pdf_path)
+        except OSError:
+            pass
+
+    elif extension in ['jpg', 'jpeg', 'png']:
+        progress("ocr")
+        try:
+            ocr_text_original = extract_text_from_image(file_path)
+
+            # For image files, convert the image to base64 for profile picture
+            with open(file_path, "rb") as image_file:
+                first_image = base64.b64encode(image_file.read()).decode('utf-8')
+        except Exception as e:
+            logger.error(f"Error extracting OCR from image: {e}")
+
+    else:
+        raise ValueError("Unsupported file format")
+
+    # Combine texts from both versions
+    text_total = f"""
+        --- OCR FROM ORIGINAL PDF ---
+        {ocr_text_original}
+
+        --- OCR FROM CLEANED PDF ---
+        {ocr_text_clean}
+        """
+    return text_total, first_image
+
+
+def structure_cv(text_total: str, max_retries: int = 5, retry_delay: float = 2) -> dict:
+    """
+    Structure le texte OCR en sections de CV avec le LLM (backoff exponentiel sur les 429).
+    La photo de profil n'en fait pas partie : le worker l'ajoute avant l'écriture du CV.
+
+    :param text_total: Texte OCR combiné
+    :return: Sections du CV, sans la photo
+    """
+    from .llm_structuring import structure_cv_json
+
+    for attempt in range(max_retries):
+        try:
+            logger.debug(f"Attempt {attempt+1}/{max_retries} to process CV with LLM")
+            cv_data = structure_cv_json(text_total)
+            break  # Success, exit retry loop
+        except Exception as e:
+            if "429" in str(e) and attempt < max_retries - 1:
+                wait_time = retry_delay * (2 ** attempt)  # Exponential backoff
+                logger.warning(f"Rate limited by API (429). Waiting {wait_time} seconds before retry...")
+                time.sleep(wait_time)
+            else:
+                # If we've exhausted all retries or it's not a rate limit error
+                raise
+
+    return cv_data
+
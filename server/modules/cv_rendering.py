@@ -0,0 +1,166 @@
+import hashlib
+import logging
+import os
+
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+
+logger = logging.getLogger(__name__)
+
+# 📌 Registre des thèmes de la page publique : paramètre `theme` -> template
+THEMES = {
+    "standard": "user_template.html",
+    "ats": "user_template_ats.html",
+    "cyberpunk": "user_template_cyberpunk.html",
+}
+DEFAULT_THEME = "standard"
+
+# Templates inclus par les thèmes, compilés eux aussi au démarrage
+SHARED_TEMPLATES = ("cv_macros.html",)
+
+
+def resolve_theme(theme: str = None) -> str:
+    """Ramène un paramètre `theme` quelconque à un thème du registre."""
+    return theme if theme in THEMES else DEFAULT_THEME
+
+
+def template_name_for(theme: str = None) -> str:
+    """
+    Sélectionne le template de la page publique en fonction du thème demandé.
+
+    :param theme: Clé de THEMES ; tout autre valeur donne le thème standard
+    :return: Nom du fichier de template
+    """
+    return THEMES[resolve_theme(theme)]
+
+
+def create_environment(directory: str, bytecode_cache_dir: str = None) -> Environment:
+    """
+    Crée l'environnement Jinja des pages publiques.
+
+    Avec `bytecode_cache_dir`, le bytecode compilé est écrit sur disque : les autres
+    workers et les redémarrages le relisent au lieu de recompiler les templates.
+
+    :param directory: Dossier des templates
+    :param bytecode_cache_dir: Dossier du cache de bytecode (optionnel)
+    :return: Environnement Jinja
+    """
+    bytecode_cache = None
+    if bytecode_cache_dir:
+        os.makedirs(bytecode_cache_dir, exist_ok=True)
+        bytecode_cache = FileSystemBytecodeCache(bytecode_cache_dir)
+
+    return Environment(
+        loader=FileSystemLoader(directory),
+        autoescape=True,
+        bytecode_cache=bytecode_cache,
+    )
+
+
+def preload_templates(env: Environment):
+    """Compile tous les thèmes pour que le premier visiteur ne paie pas la compilation."""
+    for template_name in (*SHARED_TEMPLATES, *THEMES.values()):
+        env.get_template(template_name)
+    logger.info(f"Preloaded {len(THEMES)} themes")
+
+
+def templates_fingerprint(directory: str) -> str:
+    """
+    Empreinte du contenu des templates, identique pour tous les workers d'un déploiement.
+    Elle entre dans les ETags des pages : un changement de template invalide les caches clients.
+    """
+    digest = hashlib.sha1()
+    for template_name in sorted((*SHARED_TEMPLATES, *THEMES.values())):
+        digest.update(template_name.encode("utf-8"))
+        with open(os.path.join(directory, template_name), "rb") as template_file:
+            digest.update(template_file.read())
+    return digest.hexdigest()[:12]
+
+
+def build_cv_context(name: str, cv: dict = None) -> dict:
+    """
+    Construit les données du template de la page publique à partir de `sections`.
+
+    :param name: Nom d'utilisateur de la page
+    :param cv: Contenu de `sections` du document CV (ou None)
+    :return: Dictionnaire de variables pour le template
+    """
+    context = {"cv": cv if cv is not None else {}}
+
+    if cv is None:
+        return context
+
+    # Map MongoDB document structure to template fields
+
+    # Header (full name)
+    if "first_name" in cv and "last_name" in cv:
+        context["header"] = f"{cv['first_name']} {cv['last_name']}"
+    elif "first_name" in cv:
+        context["header"] = cv['first_name']
+    elif "last_name" in cv:
+        context["header"] = cv['last_name']
+    else:
+        context["header"] = name
+
+    if "image" in cv:
+        img = cv["image"]
+        if img and isinstance(img, dict) and "image_base64" in img:
+            context["cv"]["image_base64"] = img["image_base64"]
+        elif img and isinstance(img, str):
+            # Si l'image est déjà une chaîne base64
+            context["cv"]["image_base64"] = img
+        else:
+            # S'assurer que context["cv"] existe
+            if "cv" not in context:
+                context["cv"] = {}
+            context["cv"]["image_base64"] = None
+    elif "image_base64" in cv:  # Vérifier aussi directement pour image_base64
+        context["cv"] = context.get("cv", {})
+        context["cv"]["image_base64"] = cv["image_base64"]
+
+    # Section 1 (About)
+    if "summary" in cv:
+        context["section1"] = cv["summary"]
+        
+    # Contact information
+    if "email" in cv:
+        context["email"] = cv["email"]
+        
+    if "phone" in cv:
+        context["phone"] = cv["phone"]
+        
+    if "address" in cv:
+        context["location"] = cv["address"]
+    
+    # Professional title
+    if "job_title" in cv and cv["job_title"]:
+        context["title"] = cv["job_title"]
+    elif "work_experience" in cv and cv["work_experience"] and len(cv["work_experience"]) > 0:
+        context["title"] = cv["work_experience"][0]["job_title"]
+    
+    # Sections rendered by the macros of cv_macros.html
+    if "work_experience" in cv and cv["work_experience"]:
+        context["experience"] = cv["work_experience"]
+
+    if "education" in cv and cv["education"]:
+        context["education"] = cv["education"]
+
+    if "skills" in cv and cv["skills"]:
+        context["skills"] = cv["skills"]
+
+    # Languages, hobbies and certifications are combined into section2
+    section2 = {
+        field: cv[field]
+        for field in ("languages", "hobbies", "certifications")
+        if field in cv and cv[field]
+    }
+    if section2:
+        context["section2"] = section2
+
+    if "projects" in cv and cv["projects"]:
+        context["projects"] = cv["projects"]
+
+    # Other potential sections
+    if "driving_license" in cv and cv["driving_license"]:
+        context["driving_license"] = cv["driving_license"]
+
+    return context
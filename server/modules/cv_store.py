@@ -0,0 +1,312 @@
+from datetime import datetime
+from bson import ObjectId
+from pymongo import ASCENDING
+
+# 📌 Projections par usage : chaque appelant ne lit que les champs dont il a besoin
+USER_ID_PROJECTION = {"_id": 1}
+USER_PROFILE_PROJECTION = {"_id": 1, "user_name": 1, "email": 1}
+
+# Champs de réponse de GET /api/cv/{name} -> champs de `sections` qui les alimentent
+CV_API_FIELD_SOURCES = {
+    "header": ["first_name", "last_name"],
+    "first_name": ["first_name"],
+    "last_name": ["last_name"],
+    "job_title": ["job_title"],
+    "email": ["email"],
+    "phone": ["phone"],
+    "location": ["address"],
+    "section1": ["summary"],
+    "skills": ["skills"],
+    "education": ["education"],
+    "work_experience": ["work_experience"],
+    "projects": ["projects"],
+    "hobbies": ["hobbies"],
+    "languages": ["languages"],
+    "certifications": ["certifications"],
+    "driving_license": ["driving_license"],
+    "image_base64": ["image_base64", "image"],
+}
+CV_API_FIELDS = sorted({field for sources in CV_API_FIELD_SOURCES.values() for field in sources})
+# La photo n'est renvoyée que si elle est demandée explicitement dans `fields`
+CV_API_DEFAULT_FIELDS = [field for field in CV_API_FIELD_SOURCES if field != "image_base64"]
+
+# Mode compact : pas de photo, et seulement les sous-champs courts des listes d'objets
+CV_COMPACT_EXCLUDED = {"image_base64", "image"}
+CV_COMPACT_SUBFIELDS = {
+    "work_experience": ["job_title", "company", "duration"],
+    "education": ["year", "school", "degree"],
+    "projects": ["title", "type", "technologies_used"],
+}
+
+# La page publique affiche tout le contenu de `sections`, photo comprise
+CV_PAGE_PROJECTION = {"_id": 0, "sections": 1, "updated_at": 1}
+
+
+def ensure_cv_indexes(users_collection, cvs_collection, sessions_collection):
+    """Index des recherches de la page publique : utilisateur par nom, CV par utilisateur, session par jeton (idempotent)."""
+    users_collection.create_index([("user_name", ASCENDING)])
+    cvs_collection.create_index([("user_id", ASCENDING)])
+    sessions_collection.create_index([("token", ASCENDING)])
+
+
+def cv_api_projection(fields: list = None, compact: bool = False) -> dict:
+    """
+    Construit la projection de GET /api/cv/{name} pour un sous-ensemble de champs.
+
+    :param fields: Champs de réponse demandés (clés de CV_API_FIELD_SOURCES), tous sauf la photo si None
+    :param compact: Exclut la photo et les descriptions longues
+    :return: Projection MongoDB
+    :raise ValueError: si un champ demandé n'existe pas
+    """
+    if fields is None:
+        fields = CV_API_DEFAULT_FIELDS
+    unknown = [field for field in fields if field not in CV_API_FIELD_SOURCES]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+
+    projection = {"_id": 0, "updated_at": 1}
+    for field in fields:
+        for source in CV_API_FIELD_SOURCES[field]:
+            if compact and source in CV_COMPACT_EXCLUDED:
+                continue
+            if compact and source in CV_COMPACT_SUBFIELDS:
+                projection.update({f"sections.{source}.{sub}": 1 for sub in CV_COMPACT_SUBFIELDS[source]})
+            else:
+                projection[f"sections.{source}"] = 1
+    return projection
+
+
+def find_user_id(users_collection, user_name: str):
+    """
+    Renvoie l'ObjectId d'un utilisateur à partir de son nom, sans charger le document.
+
+    :param users_collection: Collection MongoDB des utilisateurs
+    :param user_name: Nom d'utilisateur
+    :return: ObjectId ou None si l'utilisateur n'existe pas
+    """
+    user = users_collection.find_one({"user_name": user_name}, USER_ID_PROJECTION)
+    return user["_id"] if user else None
+
+
+def find_user_profile(users_collection, query: dict):
+    """
+    Renvoie uniquement l'identité d'un utilisateur (_id, user_name, email).
+
+    :param users_collection: Collection MongoDB des utilisateurs
+    :param query: Filtre MongoDB
+    :return: Document réduit ou None
+    """
+    return users_collection.find_one(query, USER_PROFILE_PROJECTION)
+
+
+def find_cv(cvs_collection, user_id, projection: dict):
+    """
+    Lit le CV d'un utilisateur avec une projection explicite.
+
+    :param cvs_collection: Collection MongoDB des CV
+    :param user_id: Identifiant de l'utilisateur (str ou ObjectId)
+    :param projection: Champs à renvoyer
+    :return: Document projeté ou None
+    """
+    return cvs_collection.find_one({"user_id": ObjectId(user_id)}, projection)
+
+
+def validate_section_names(changes: dict):
+    """
+    Vérifie que les noms de sections peuvent servir de clés MongoDB.
+
+    :param changes: Dictionnaire {section: contenu}
+    :raise ValueError: si un nom est vide, contient un point ou commence par `$`
+    """
+    for section in changes:
+        if not isinstance(section, str) or not section or "." in section or section.startswith("$"):
+            raise ValueError(f"Invalid section name: {section!r}")
+
+
+def section_changes_pipeline(changes: dict, now: datetime = None) -> list:
+    """
+    Construit la mise à jour (pipeline) qui fusionne `changes` dans `sections`.
+
+    Les CV au format legacy (sans `sections`) et les CV inexistants reçoivent un objet
+    `sections` : le même pipeline couvre les trois cas, sans lecture préalable.
+
+    :param changes: Dictionnaire {section: contenu}
+    :param now: Date de mise à jour
+    :return: Pipeline de mise à jour
+    """
+    now = now or datetime.utcnow()
+    # $literal : le contenu utilisateur ne doit jamais être interprété comme une expression
+    literal_changes = {section: {"$literal": content} for section, content in changes.items()}
+    return [{"$set": {
+        "sections": {"$mergeObjects": [{"$ifNull": ["$sections", {}]}, literal_changes]},
+        "updated_at": now,
+        "created_at": {"$ifNull": ["$created_at", now]},
+    }}]
+
+
+def cv_version(updated_at: datetime = None):
+    """Version d'un CV telle qu'exposée par l'API (`updated_at` au format ISO), ou None."""
+    return updated_at.isoformat() if updated_at else None
+
+
+def parse_cv_version(version: str) -> datetime:
+    """
+    Relit une version renvoyée par `cv_version`.
+
+    :raise ValueError: si la version n'est pas une date ISO
+    """
+    return datetime.fromisoformat(version)
+
+
+def _mongo_now() -> datetime:
+    # MongoDB stocke les dates à la milliseconde : la version renvoyée doit être celle relue
+    now = datetime.utcnow()
+    return now.replace(microsecond=now.microsecond // 1000 * 1000)
+
+
+def apply_section_changes(cvs_collection, user_id, changes: dict, expected_version: datetime = None):
+    """
+    Applique un lot de modifications de sections en une seule écriture atomique.
+
+    Sans `expected_version`, c'est un upsert inconditionnel. Avec, l'écriture n'a lieu
+    que si le CV est toujours à cette version (contrôle de concurrence optimiste) :
+    une modification faite entre-temps (autre onglet, upload) n'est jamais écrasée.
+
+    :param cvs_collection: Collection MongoDB des CV
+    :param user_id: Identifiant de l'utilisateur (str ou ObjectId)
+    :param changes: Dictionnaire {section: contenu}
+    :param expected_version: `updated_at` du CV sur lequel les modifications ont été faites
+    :return: Nouvelle valeur de `updated_at`, ou None si la version ne correspond plus
+    """
+    validate_section_names(changes)
+    now = _mongo_now()
+
+    query = {"user_id": ObjectId(user_id)}
+    if expected_version is not None:
+        query["updated_at"] = expected_version
+
+    result = cvs_collection.update_one(
+        query,
+        section_changes_pipeline(changes, now),
+        upsert=expected_version is None,
+    )
+    if expected_version is not None and result.matched_count == 0:
+        return None
+    return now
+
+
+def replace_cv_sections(cvs_collection, user_id, sections: dict, uploaded_at: datetime = None):
+    """
+    Remplace toutes les sections d'un CV (résultat d'un upload), en créant le CV au besoin.
+
+    Avec `uploaded_at`, l'écriture est conditionnelle : un upload plus ancien que celui
+    qui a produit le CV actuel ne le remplace pas (traitements terminés dans le désordre).
+
+    :param cvs_collection: Collection MongoDB des CV
+    :param user_id: Identifiant de l'utilisateur (str ou ObjectId)
+    :param sections: Nouvelles sections du CV
+    :param uploaded_at: Date de l'upload dont proviennent les sections
+    :return: Nouvelle valeur de `updated_at`, ou None si un upload plus récent a déjà été enregistré
+    """
+    now = _mongo_now()
+    if uploaded_at is None:
+        cvs_collection.update_one(
+            {"user_id": ObjectId(user_id)},
+            {"$set": {"sections": sections, "updated_at": now}, "$setOnInsert": {"created_at": now}},
+            upsert=True,
+        )
+        return now
+
+    result = cvs_collection.update_one(
+        {
+            "user_id": ObjectId(user_id),
+            "$or": [{"uploaded_at": {"$exists": False}}, {"uploaded_at": {"$lte": uploaded_at}}],
+        },
+        {"$set": {"sections": sections, "updated_at": now, "uploaded_at": uploaded_at}},
+    )
+    if result.matched_count:
+        return now
+
+    # Pas encore de CV, ou CV issu d'un upload plus récent (laissé tel quel)
+    result = cvs_collection.update_one(
+        {"user_id": ObjectId(user_id)},
+        {"$setOnInsert": {"sections": sections, "updated_at": now, "uploaded_at": uploaded_at, "created_at": now}},
+        upsert=True,
+    )
+    return now if result.upserted_id is not None else None
+
+
+def public_page_pipeline(user_name: str, cvs_name: str, sessions_name: str, users_name: str,
+                         session_token: str = None, now: datetime = None) -> list:
+    """
+    Construit l'agrégation qui renvoie, en un seul aller-retour, l'utilisateur,
+    le contenu de son CV et le nom de l'utilisateur connecté via le cookie de session.
+
+    :param user_name: Nom d'utilisateur de la page publique
+    :param cvs_name: Nom de la collection des CV
+    :param sessions_name: Nom de la collection des sessions
+    :param users_name: Nom de la collection des utilisateurs
+    :param session_token: Jeton de session du visiteur (optionnel)
+    :param now: Date de référence pour l'expiration des sessions
+    :return: Pipeline d'agrégation à exécuter sur la collection des utilisateurs
+    """
+    pipeline = [
+        {"$match": {"user_name": user_name}},
+        {"$limit": 1},
+        # Jointures d'égalité (localField/foreignField) : elles passent par l'index de la clé jointe
+        {"$lookup": {
+            "from": cvs_name,
+            "localField": "_id",
+            "foreignField": "user_id",
+            "pipeline": [
+                {"$limit": 1},
+                {"$project": CV_PAGE_PROJECTION},
+            ],
+            "as": "cv",
+        }},
+    ]
+
+    project = {"_id": 1, "cv": {"$arrayElemAt": ["$cv", 0]}}
+
+    if session_token:
+        # Sous-requête non corrélée : session valide -> nom de son propriétaire
+        pipeline.append({"$lookup": {
+            "from": sessions_name,
+            "pipeline": [
+                {"$match": {"token": session_token, "expires_at": {"$gt": now or datetime.utcnow()}}},
+                {"$limit": 1},
+                {"$addFields": {"owner_id": {"$toObjectId": "$user_id"}}},
+                {"$lookup": {
+                    "from": users_name,
+                    "localField": "owner_id",
+                    "foreignField": "_id",
+                    "pipeline": [
+                        {"$project": {"_id": 0, "user_name": 1}},
+                    ],
+                    "as": "user",
+                }},
+                {"$project": {"_id": 0, "user_name": {"$arrayElemAt": ["$user.user_name", 0]}}},
+            ],
+            "as": "session",
+        }})
+        project["current_user_name"] = {"$arrayElemAt": ["$session.user_name", 0]}
+
+    pipeline.append({"$project": project})
+    return pipeline
+
+
+def find_public_page(users_collection, cvs_collection, sessions_collection,
+                     user_name: str, session_token: str = None):
+    """
+    Récupère les données d'une page publique de CV en une seule requête.
+
+    :return: Dictionnaire {"_id", "cv", "current_user_name"} ou None si l'utilisateur n'existe pas
+    """
+    pipeline = public_page_pipeline(
+        user_name,
+        cvs_collection.name,
+        sessions_collection.name,
+        users_collection.name,
+        session_token,
+    )
+    return next(users_collection.aggregate(pipeline), None)
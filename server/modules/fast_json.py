@@ -0,0 +1,55 @@
+import json
+from datetime import date, datetime
+
+from bson import ObjectId
+from starlette.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # sans orjson, repli sur le module json standard (même sortie, plus lent)
+    orjson = None
+
+
+def _default(obj):
+    """Types non natifs présents dans les documents MongoDB."""
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(obj) -> bytes:
+    """
+    Sérialise en JSON compact UTF-8 (ObjectId -> str, datetime -> ISO 8601).
+
+    :param obj: Objet à sérialiser
+    :return: JSON encodé
+    """
+    if orjson is not None:
+        # 📌 orjson sérialise datetime nativement ; les clés non-str (int...) sont converties
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def loads(data):
+    """
+    Désérialise du JSON (str ou bytes).
+
+    :raise ValueError: si le JSON est invalide
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSONResponse sérialisée avec orjson.
+
+    Renvoyée directement par un endpoint, elle évite aussi le passage par
+    `jsonable_encoder` : les documents MongoDB sont encodés tels quels.
+    """
+
+    def render(self, content) -> bytes:
+        return dumps(content)
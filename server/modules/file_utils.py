@@ -0,0 +1,20 @@
+import os
+import tempfile
+
+
+def write_atomic(path: str, data: bytes):
+    """
+    Écrit un fichier via un fichier temporaire + rename : un lecteur (serveur, reverse
+    proxy, autre worker) ne voit jamais de fichier partiel.
+
+    :param path: Chemin du fichier (son dossier doit exister)
+    :param data: Contenu à écrire
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as tmp_file:
+            tmp_file.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
@@ -0,0 +1,125 @@
+import functools
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+from pymongo import ASCENDING
+
+from .job_queue import queue_depth
+from .upload_jobs import STATUS_QUEUED
+
+# 📌 Fenêtre glissante des appels au fournisseur (OCR, LLM) prise en compte par /readyz
+PROVIDER_WINDOW_SECONDS = 300
+# Taux d'erreur au-delà duquel une opération est dégradée, à partir de MIN_CALLS appels
+PROVIDER_ERROR_RATE = 0.5
+PROVIDER_MIN_CALLS = 5
+# Attente maximale du plus ancien job dû avant de signaler une file en retard
+QUEUE_MAX_WAIT_SECONDS = 600
+
+
+def _percentile(sorted_values: list, fraction: float) -> float:
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class ProviderStats:
+    """
+    Latence et erreurs récentes des appels à un service externe, par opération.
+    Partagé entre les fils du processus ; les appels plus vieux que `window` sont oubliés.
+    """
+
+    def __init__(self, window: float = PROVIDER_WINDOW_SECONDS, maxlen: int = 10000):
+        self.window = window
+        self._calls = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+
+    def record(self, operation: str, duration: float, ok: bool):
+        with self._lock:
+            self._calls.append((time.monotonic(), operation, duration, ok))
+
+    @contextmanager
+    def track(self, operation: str):
+        """Mesure le bloc ; une exception le compte comme une erreur et est propagée."""
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.record(operation, time.perf_counter() - start, False)
+            raise
+        self.record(operation, time.perf_counter() - start, True)
+
+    def timed(self, operation: str):
+        """Décorateur équivalent à track() pour une fonction entière."""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.track(operation):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def summary(self) -> dict:
+        """
+        Résumé de la fenêtre courante par opération.
+
+        :return: {opération: {calls, errors, error_rate, p50_ms, p95_ms, degraded}}
+        """
+        cutoff = time.monotonic() - self.window
+        with self._lock:
+            while self._calls and self._calls[0][0] < cutoff:
+                self._calls.popleft()
+            calls = list(self._calls)
+
+        by_operation = {}
+        for _, operation, duration, ok in calls:
+            by_operation.setdefault(operation, []).append((duration, ok))
+
+        report = {}
+        for operation, entries in by_operation.items():
+            durations = sorted(duration for duration, _ in entries)
+            errors = sum(1 for _, ok in entries if not ok)
+            error_rate = errors / len(entries)
+            report[operation] = {
+                "calls": len(entries),
+                "errors": errors,
+                "error_rate": round(error_rate, 3),
+                "p50_ms": round(_percentile(durations, 0.5) * 1000),
+                "p95_ms": round(_percentile(durations, 0.95) * 1000),
+                "degraded": len(entries) >= PROVIDER_MIN_CALLS and error_rate >= PROVIDER_ERROR_RATE,
+            }
+        return report
+
+
+# Appels à Mistral (OCR et structuration) faits par ce processus
+provider_stats = ProviderStats()
+
+
+def mongo_status(client) -> dict:
+    """Ping de MongoDB et sa latence ; ne lève pas d'exception."""
+    start = time.perf_counter()
+    try:
+        client.admin.command("ping")
+    except Exception as e:
+        return {"ok": False, "error": str(e)}
+    return {"ok": True, "latency_ms": round((time.perf_counter() - start) * 1000, 1)}
+
+
+def queue_status(jobs_collection) -> dict:
+    """
+    Profondeur de la file des uploads et attente du plus ancien job dû.
+
+    :return: {queued, running, oldest_wait_seconds, degraded}
+    """
+    now = datetime.utcnow()
+    status = queue_depth(jobs_collection)
+    oldest = jobs_collection.find_one(
+        {"status": STATUS_QUEUED, "available_at": {"$lte": now}},
+        {"available_at": 1},
+        sort=[("available_at", ASCENDING)],
+    )
+    wait = (now - oldest["available_at"]).total_seconds() if oldest else 0.0
+    status["oldest_wait_seconds"] = round(wait, 1)
+    status["degraded"] = wait > QUEUE_MAX_WAIT_SECONDS
+    return status
@@ -0,0 +1,232 @@
+import hashlib
+import zlib
+
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # sans brotli, seul gzip est proposé
+    brotli = None
+
+# 📌 Types de contenu qui gagnent à être compressés (les images et PDF le sont déjà)
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/javascript", "application/xml", "image/svg+xml")
+
+# Suffixe ajouté à l'ETag d'une représentation compressée (une ETag forte par encodage)
+ENCODING_SUFFIXES = {"br": "-br", "gzip": "-gzip"}
+
+
+def make_etag(*parts) -> str:
+    """
+    Construit une ETag forte à partir des éléments qui déterminent la réponse
+    (utilisateur, version du CV, thème, ...).
+    """
+    digest = hashlib.sha1("|".join(str(part) for part in parts).encode("utf-8")).hexdigest()
+    return f'"{digest[:20]}"'
+
+
+def _strip_etag(etag: str) -> str:
+    """Retire le préfixe faible et le suffixe d'encodage d'une ETag."""
+    etag = etag.strip()
+    if etag.startswith("W/"):
+        etag = etag[2:]
+    for suffix in ENCODING_SUFFIXES.values():
+        if etag.endswith(suffix + '"'):
+            return etag[:-len(suffix) - 1] + '"'
+    return etag
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """
+    Indique si l'en-tête If-None-Match désigne la représentation courante.
+
+    :param if_none_match: Valeur de l'en-tête If-None-Match (ou None)
+    :param etag: ETag courante, sans suffixe d'encodage
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return matching_etag(if_none_match, etag) is not None
+
+
+def matching_etag(if_none_match: str, etag: str):
+    """
+    ETag de If-None-Match qui désigne la représentation courante, telle que le client
+    la détient (suffixe d'encodage compris) : c'est elle qu'une réponse 304 renvoie.
+
+    :return: L'ETag du client, ou None si aucune ne correspond
+    """
+    if not if_none_match or not etag:
+        return None
+    for candidate in if_none_match.split(","):
+        if _strip_etag(candidate) == etag:
+            return candidate.strip()
+    return None
+
+
+def parse_accept_encoding(accept_encoding: str) -> dict:
+    """
+    Analyse un en-tête Accept-Encoding.
+
+    :return: {codage en minuscules: q-value}, `*` compris s'il est présent
+    """
+    codings = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        codings[coding] = quality
+    return codings
+
+
+def choose_encoding(accept_encoding: str, available=None):
+    """
+    Choisit le codage accepté avec la plus forte q-value parmi `available` ; à égalité,
+    l'ordre de `available` départage (brotli avant gzip). Un codage à q=0 est refusé.
+
+    :param accept_encoding: En-tête Accept-Encoding de la requête
+    :param available: Codages proposés par ordre de préférence (brotli et gzip par défaut)
+    :return: "br", "gzip" ou None
+    """
+    if available is None:
+        available = ("br", "gzip") if brotli is not None else ("gzip",)
+    codings = parse_accept_encoding(accept_encoding)
+    best, best_quality = None, 0.0
+    for encoding in available:
+        quality = codings.get(encoding, codings.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+class _GzipStream:
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush()
+
+
+class _BrotliStream:
+    def __init__(self, quality: int):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.finish()
+
+
+class CompressionMiddleware:
+    """
+    Middleware ASGI de compression brotli/gzip.
+
+    Les réponses plus petites que `minimum_size`, déjà encodées, sans corps (204/304)
+    ou d'un type non compressible passent telles quelles. L'ETag d'une réponse
+    compressée reçoit un suffixe par encodage, que `etag_matches` sait retirer ;
+    une réponse 304 renvoie l'ETag suffixée que le client a présentée.
+    """
+
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 5):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            request_headers = Headers(scope=scope)
+            encoding = choose_encoding(request_headers.get("accept-encoding", ""))
+            if encoding:
+                responder = _CompressionResponder(self, encoding, send, request_headers.get("if-none-match"))
+                await self.app(scope, receive, responder.send)
+                return
+        await self.app(scope, receive, send)
+
+    def make_stream(self, encoding: str):
+        if encoding == "br":
+            return _BrotliStream(self.brotli_quality)
+        return _GzipStream(self.gzip_level)
+
+
+class _CompressionResponder:
+    def __init__(self, middleware: CompressionMiddleware, encoding: str, send, if_none_match: str = None):
+        self.middleware = middleware
+        self.encoding = encoding
+        self._send = send
+        self.if_none_match = if_none_match
+        self.start_message = None
+        self.stream = None
+        self.passthrough = False
+
+    def _compressible(self, headers: MutableHeaders) -> bool:
+        if self.start_message["status"] in (204, 304) or "content-encoding" in headers:
+            return False
+        content_type = headers.get("content-type", "")
+        return content_type.startswith(COMPRESSIBLE_TYPES)
+
+    async def send(self, message):
+        message_type = message["type"]
+
+        if message_type == "http.response.start":
+            # Les en-têtes dépendent du premier morceau de corps : on les retient
+            self.start_message = message
+            return
+
+        if message_type != "http.response.body" or self.passthrough:
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.stream is None:
+            headers = MutableHeaders(raw=self.start_message["headers"])
+            if not self._compressible(headers) or (not more_body and len(body) < self.middleware.minimum_size):
+                self.passthrough = True
+                if self.start_message["status"] == 304:
+                    # La route ne connaît que l'ETag sans suffixe
+                    held_etag = matching_etag(self.if_none_match, headers.get("etag"))
+                    if held_etag:
+                        headers["ETag"] = held_etag
+                await self._send(self.start_message)
+                await self._send(message)
+                return
+
+            self.stream = self.middleware.make_stream(self.encoding)
+            headers["Content-Encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+            etag = headers.get("etag")
+            if etag and etag.endswith('"'):
+                headers["ETag"] = etag[:-1] + ENCODING_SUFFIXES[self.encoding] + '"'
+
+            data = self.stream.compress(body)
+            if more_body:
+                # Réponse en flux : la taille finale est inconnue
+                if "content-length" in headers:
+                    del headers["Content-Length"]
+            else:
+                data += self.stream.flush()
+                headers["Content-Length"] = str(len(data))
+
+            await self._send(self.start_message)
+            await self._send({"type": "http.response.body", "body": data, "more_body": more_body})
+            return
+
+        data = self.stream.compress(body)
+        if not more_body:
+            data += self.stream.flush()
+        await self._send({"type": "http.response.body", "body": data, "more_body": more_body})
@@ -28,7 +28,8 @@ def extract_photo_from_pdf(pdf_path):
     return None
 
 
-# Extraction de la photo
-photo_path = extract_photo_from_pdf("data/CV-JOMAA.pdf")
+if __name__ == "__main__":
+    # Extraction de la photo
+    photo_path = extract_photo_from_pdf("data/CV-JOMAA.pdf")
 
-print(photo_path)
+    print(photo_path)
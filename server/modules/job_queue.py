@@ -0,0 +1,260 @@
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+
+from pymongo import ASCENDING, ReturnDocument
+
+from .upload_jobs import STATUS_QUEUED, STATUS_RUNNING, STATUS_DONE, STATUS_FAILED
+
+# 📌 File d'attente durable des uploads, portée par la collection des jobs :
+# un worker « prend » un job en posant un bail (lease) qu'il renouvelle tant qu'il
+# travaille. Un bail expiré (worker arrêté ou planté) rend le job à la file.
+LEASE_SECONDS = 300
+MAX_ATTEMPTS = 3
+RETRY_DELAY_SECONDS = 30
+# Dernière étape (cv_pipeline.STAGES) : l'écriture du CV, que seul le titulaire du bail fait
+SAVING_STAGE = "saving"
+
+
+class LeaseLost(Exception):
+    """Le worker n'est plus titulaire du bail du job : il ne doit plus rien écrire."""
+
+
+def new_worker_id() -> str:
+    """Identifiant unique d'un consommateur : machine, processus et fil."""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def ensure_queue_indexes(jobs_collection):
+    """Index des requêtes de prise de job, de récupération des baux expirés et de rafraîchissement (idempotent)."""
+    jobs_collection.create_index([("status", ASCENDING), ("available_at", ASCENDING)])
+    jobs_collection.create_index([("status", ASCENDING), ("lease_expires_at", ASCENDING)])
+    jobs_collection.create_index([("status", ASCENDING), ("refreshed", ASCENDING)])
+
+
+def claim_job(jobs_collection, worker_id: str, lease_seconds: int = LEASE_SECONDS,
+              max_attempts: int = MAX_ATTEMPTS):
+    """
+    Prend atomiquement le plus ancien job disponible : en attente et dû, ou dont le
+    bail a expiré sans qu'il ait épuisé ses tentatives.
+
+    :param worker_id: Identifiant du worker (voir new_worker_id)
+    :param lease_seconds: Durée du bail
+    :param max_attempts: Nombre maximal de tentatives d'un job
+    :return: Document du job (avec `payload`), ou None si la file est vide
+    """
+    now = datetime.utcnow()
+    return jobs_collection.find_one_and_update(
+        {
+            "$or": [
+                {"status": STATUS_QUEUED, "available_at": {"$lte": now}},
+                {"status": STATUS_RUNNING, "lease_expires_at": {"$lt": now}},
+            ],
+            "attempts": {"$lt": max_attempts},
+        },
+        {
+            "$set": {
+                "status": STATUS_RUNNING,
+                "lease_owner": worker_id,
+                "lease_expires_at": now + timedelta(seconds=lease_seconds),
+                "updated_at": now,
+            },
+            "$inc": {"attempts": 1},
+        },
+        sort=[("available_at", ASCENDING)],
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+def renew_lease(jobs_collection, job_id, worker_id: str, lease_seconds: int = LEASE_SECONDS) -> bool:
+    """
+    Prolonge le bail d'un job en cours.
+
+    :return: False si le bail appartient désormais à un autre worker
+    """
+    result = jobs_collection.update_one(
+        {"_id": job_id, "status": STATUS_RUNNING, "lease_owner": worker_id},
+        {"$set": {"lease_expires_at": datetime.utcnow() + timedelta(seconds=lease_seconds)}},
+    )
+    return result.matched_count == 1
+
+
+def save_checkpoint(jobs_collection, job_id, worker_id: str, name: str, value, drop_payload: bool = False) -> bool:
+    """
+    Enregistre dans le job le résultat d'une étape coûteuse (OCR, LLM) : une tentative
+    suivante, après un arrêt ou une erreur, repart de là au lieu de repayer l'étape.
+
+    :param drop_payload: Retire en même temps le fichier envoyé, devenu inutile
+    :return: False si le bail a été perdu
+    """
+    update = {"$set": {f"checkpoint.{name}": value, "updated_at": datetime.utcnow()}}
+    if drop_payload:
+        update["$unset"] = {"payload": ""}
+    result = jobs_collection.update_one({"_id": job_id, "lease_owner": worker_id}, update)
+    return result.matched_count == 1
+
+
+def begin_save(jobs_collection, job_id, worker_id: str, lease_seconds: int = LEASE_SECONDS) -> bool:
+    """
+    Réserve l'écriture du CV au titulaire du bail : passe le job à l'étape `saving` en
+    prolongeant le bail. Un job à cette étape n'est plus rendu à la file (release_job)
+    et son bail ne peut pas expirer pendant l'écriture.
+
+    :return: False si le bail a été perdu ou rendu : le CV ne doit pas être écrit
+    """
+    now = datetime.utcnow()
+    result = jobs_collection.update_one(
+        {"_id": job_id, "status": STATUS_RUNNING, "lease_owner": worker_id},
+        {"$set": {"stage": SAVING_STAGE, "lease_expires_at": now + timedelta(seconds=lease_seconds),
+                  "updated_at": now}},
+    )
+    return result.matched_count == 1
+
+
+def release_job(jobs_collection, job_id, worker_id: str) -> bool:
+    """
+    Rend immédiatement à la file un job interrompu par l'arrêt de son worker.
+    La tentative n'est pas comptée et les checkpoints sont conservés. Un job en train
+    d'écrire le CV (voir begin_save) n'est pas rendu : son worker le termine.
+
+    :return: False si le bail avait déjà été perdu, ou si le job écrit le CV
+    """
+    now = datetime.utcnow()
+    result = jobs_collection.update_one(
+        {"_id": job_id, "status": STATUS_RUNNING, "lease_owner": worker_id, "stage": {"$ne": SAVING_STAGE}},
+        {
+            "$set": {"status": STATUS_QUEUED, "stage": None, "available_at": now, "updated_at": now},
+            "$unset": {"lease_owner": "", "lease_expires_at": ""},
+            "$inc": {"attempts": -1},
+        },
+    )
+    return result.matched_count == 1
+
+
+def complete_job(jobs_collection, job_id, worker_id: str) -> bool:
+    """
+    Marque le job comme terminé et libère le fichier envoyé.
+    Les caches et snapshots du tier web sont rafraîchis au premier suivi (voir claim_refresh).
+
+    :return: False si le bail avait été perdu (le résultat d'un autre worker prime)
+    """
+    result = jobs_collection.update_one(
+        {"_id": job_id, "lease_owner": worker_id},
+        {
+            "$set": {"status": STATUS_DONE, "stage": None, "refreshed": False, "updated_at": datetime.utcnow()},
+            "$unset": {"payload": "", "checkpoint": "", "lease_owner": "", "lease_expires_at": ""},
+        },
+    )
+    return result.matched_count == 1
+
+
+def retry_or_dead_letter(jobs_collection, dead_letters_collection, job: dict, error: str, user_error: str,
+                         max_attempts: int = MAX_ATTEMPTS, retry_delay: float = RETRY_DELAY_SECONDS):
+    """
+    Traite l'échec d'une tentative : remise en file avec backoff exponentiel, ou,
+    tentatives épuisées, copie dans la file des lettres mortes et échec visible.
+
+    :param job: Document du job tel que pris par claim_job
+    :param error: Erreur technique (historique du job)
+    :param user_error: Message affiché à l'utilisateur si le job échoue définitivement
+    :return: True si le job a été remis en file
+    """
+    now = datetime.utcnow()
+    failure = {"at": now, "worker": job.get("lease_owner"), "error": error}
+
+    if job.get("attempts", 0) < max_attempts:
+        delay = retry_delay * (2 ** (job.get("attempts", 1) - 1))
+        jobs_collection.update_one(
+            {"_id": job["_id"], "lease_owner": job.get("lease_owner")},
+            {
+                "$set": {"status": STATUS_QUEUED, "stage": None, "available_at": now + timedelta(seconds=delay),
+                         "updated_at": now},
+                "$unset": {"lease_owner": "", "lease_expires_at": ""},
+                "$push": {"failures": failure},
+            },
+        )
+        return True
+
+    dead_letter_job(jobs_collection, dead_letters_collection, job, failure, user_error)
+    return False
+
+
+def dead_letter_job(jobs_collection, dead_letters_collection, job: dict, failure: dict, user_error: str) -> bool:
+    """
+    Archive un job qui a épuisé ses tentatives (fichier ou checkpoints compris, pour analyse ou rejeu)
+    et le marque comme échoué pour l'utilisateur.
+
+    :return: False si le job a changé entre-temps (bail repris ou job terminé)
+    """
+    now = datetime.utcnow()
+    result = jobs_collection.update_one(
+        {"_id": job["_id"], "lease_owner": job.get("lease_owner")},
+        {
+            "$set": {"status": STATUS_FAILED, "stage": None, "error": user_error, "updated_at": now},
+            "$unset": {"payload": "", "checkpoint": "", "lease_owner": "", "lease_expires_at": ""},
+            "$push": {"failures": failure},
+        },
+    )
+    if result.matched_count == 0:
+        return False
+
+    dead_letters_collection.replace_one(
+        {"_id": job["_id"]},
+        {**job, "failures": [*job.get("failures", []), failure], "dead_lettered_at": now},
+        upsert=True,
+    )
+    return True
+
+
+def reap_expired_jobs(jobs_collection, dead_letters_collection, max_attempts: int = MAX_ATTEMPTS,
+                      user_error: str = "Error processing CV: processing was interrupted too many times") -> int:
+    """
+    Envoie aux lettres mortes les jobs dont le bail a expiré après leur dernière tentative
+    (worker arrêté à chaque essai, ou fichier qui le fait planter).
+
+    :return: Nombre de jobs archivés
+    """
+    now = datetime.utcnow()
+    reaped = 0
+    expired = jobs_collection.find({
+        "status": STATUS_RUNNING,
+        "lease_expires_at": {"$lt": now},
+        "attempts": {"$gte": max_attempts},
+    })
+    for job in expired:
+        failure = {"at": now, "worker": job.get("lease_owner"), "error": "lease expired"}
+        if dead_letter_job(jobs_collection, dead_letters_collection, job, failure, user_error):
+            reaped += 1
+    return reaped
+
+
+def claim_refresh(jobs_collection, job_id) -> bool:
+    """
+    Réserve, pour un seul processus web, le rafraîchissement (caches, snapshots)
+    qui suit un job terminé.
+
+    :return: True si l'appelant doit rafraîchir
+    """
+    result = jobs_collection.update_one({"_id": job_id, "status": STATUS_DONE, "refreshed": False},
+                                        {"$set": {"refreshed": True}})
+    return result.modified_count == 1
+
+
+def claim_pending_refreshes(jobs_collection, limit: int = 100) -> list:
+    """
+    Réserve les rafraîchissements que le suivi du client n'a pas déclenchés
+    (onglet fermé, job terminé par worker.py sans que personne ne le suive).
+
+    :return: Jobs réservés (`_id` et `user_name`), à rafraîchir par l'appelant
+    """
+    pending = jobs_collection.find({"status": STATUS_DONE, "refreshed": False}, {"user_name": 1}, limit=limit)
+    return [job for job in pending if claim_refresh(jobs_collection, job["_id"])]
+
+
+def queue_depth(jobs_collection) -> dict:
+    """Nombre de jobs en attente et en cours."""
+    return {
+        STATUS_QUEUED: jobs_collection.count_documents({"status": STATUS_QUEUED}),
+        STATUS_RUNNING: jobs_collection.count_documents({"status": STATUS_RUNNING}),
+    }
@@ -1,7 +1,8 @@
-import json
 import time
 from mistralai import Mistral
 from .config import API_KEY
+from .fast_json import loads
+from .health import provider_stats
 
 def structure_cv_json(ocr_text: str) -> dict:
     """
@@ -17,12 +18,14 @@ def structure_cv_json(ocr_text: str) -> dict:
 
     for attempt in range(max_retries):
         try:
-            chat_response = client.chat.complete(
-                model="ministral-8b-latest",
-                messages=[
-                    {
-                        "role": "user",
-                       "content": f'''
+            # Seul l'appel est mesuré, pas l'attente entre deux essais
+            with provider_stats.track("chat"):
+                chat_response = client.chat.complete(
+                    model="ministral-8b-latest",
+                    messages=[
+                        {
+                            "role": "user",
+                           "content": f'''
 This is the OCR-extracted text from a resume, formatted in Markdown.  
 The OCR was performed on two versions of the document:  
 - **Original PDF** (captures standard text)  
@@ -73,11 +76,11 @@ If a **summary** is missing, generate a concise 2-line summary highlighting expe
 5. **If both OCR versions contain similar content, select the clearest version.**
 '''
 ,
-                    },
-                ],
-                response_format={"type": "json_object"},
-                temperature=0
-            )
+                        },
+                    ],
+                    response_format={"type": "json_object"},
+                    temperature=0
+                )
             break
         except Exception as e:
             if "429" in str(e) and attempt < max_retries - 1:
@@ -86,5 +89,5 @@ If a **summary** is missing, generate a concise 2-line summary highlighting expe
             else:
                 raise
 
-    response_dict = json.loads(chat_response.choices[0].message.content)
+    response_dict = loads(chat_response.choices[0].message.content)
     return response_dict
\ No newline at end of file
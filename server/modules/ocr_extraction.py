@@ -3,16 +3,11 @@ import json
 from mistralai import Mistral
 from mistralai import DocumentURLChunk, ImageURLChunk, TextChunk
 from pathlib import Path
-from .config import API_KEY,MONGO_URI
-
-from pymongo import MongoClient
-
-# 📌 Configuration MongoDB
-client = MongoClient(MONGO_URI)
-db = client["Challenge_SISE"]
-collection_cvs = db["cvs"]
+from .config import API_KEY
+from .health import provider_stats
 
 # 📌 Clé API Mistral
+@provider_stats.timed("ocr")
 def extract_text_and_first_image_from_pdf(pdf_path: str, user_email: str) -> dict:
     """
     Envoie un PDF à Mistral OCR, récupère le texte en Markdown et **uniquement la première image de la première page**.
@@ -63,6 +58,7 @@ def extract_text_and_first_image_from_pdf(pdf_path: str, user_email: str) -> dic
 
     return {"markdown": all_markdown_content, "image": first_image}
 
+@provider_stats.timed("ocr")
 def extract_text_from_pdf(pdf_path: str) -> str:
     """
     Envoie un PDF à Mistral OCR et récupère le texte en format Markdown.
@@ -98,6 +94,7 @@ def extract_text_from_pdf(pdf_path: str) -> str:
     return all_markdown_content
 
 
+@provider_stats.timed("ocr")
 def extract_text_from_image(image_path: str) -> str:
     """
     Envoie une image à Mistral OCR et récupère le texte en format Markdown.
@@ -0,0 +1,57 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+
+# 📌 Coût bcrypt (log2 du nombre d'itérations) et taille du pool dédié
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12))
+PASSWORD_WORKERS = int(os.getenv("PASSWORD_WORKERS", 2))
+
+# bcrypt libère le GIL : un petit pool de threads suffit à sortir le calcul de la boucle
+# d'événements, tout en bornant le nombre de dérivations de clé simultanées.
+_executor = ThreadPoolExecutor(max_workers=PASSWORD_WORKERS, thread_name_prefix="bcrypt")
+
+
+def hash_password(password: str) -> str:
+    """Hash a password for storing using bcrypt"""
+    salt = bcrypt.gensalt(rounds=BCRYPT_ROUNDS)
+    hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
+    return hashed.decode('utf-8')
+
+
+def verify_password(stored_password: str, provided_password: str) -> bool:
+    """Verify a stored password against one provided by user using bcrypt"""
+    if not stored_password or not provided_password:
+        return False
+
+    try:
+        return bcrypt.checkpw(provided_password.encode('utf-8'), stored_password.encode('utf-8'))
+    except Exception:
+        return False
+
+
+def needs_rehash(stored_password: str) -> bool:
+    """Indique si le hash a été calculé avec un autre coût que BCRYPT_ROUNDS."""
+    try:
+        # Format : $2b$<coût>$<sel+hash>
+        return int(stored_password.split("$")[2]) != BCRYPT_ROUNDS
+    except (AttributeError, IndexError, ValueError):
+        return True
+
+
+async def hash_password_async(password: str) -> str:
+    """Hash a password on the bcrypt worker pool"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, hash_password, password)
+
+
+async def verify_password_async(stored_password: str, provided_password: str) -> bool:
+    """Verify a password on the bcrypt worker pool"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, verify_password, stored_password, provided_password)
+
+
+def shutdown(wait: bool = True):
+    """Arrête le pool bcrypt."""
+    _executor.shutdown(wait=wait)
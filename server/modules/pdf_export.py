@@ -0,0 +1,40 @@
+import io
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 📌 Format et marges (en points) des CV exportés
+PAGE_SIZE = "a4"
+PAGE_MARGIN = 36
+
+
+def html_to_pdf(html: str, base_dir: str = ".", page_size: str = PAGE_SIZE, margin: int = PAGE_MARGIN) -> bytes:
+    """
+    Convertit une page HTML rendue en PDF avec l'API Story de PyMuPDF.
+
+    Les ressources référencées par la page (feuilles de style /static/...) sont lues
+    dans `base_dir`, sans requête HTTP.
+
+    :param html: Page HTML complète
+    :param base_dir: Dossier racine des ressources (celui qui contient `static/`)
+    :param page_size: Format de page PyMuPDF (ex. "a4", "letter")
+    :param margin: Marge en points sur chaque bord
+    :return: Document PDF
+    """
+    import fitz  # 📌 Import paresseux : PyMuPDF n'est chargé qu'au premier export
+
+    story = fitz.Story(html=html, archive=fitz.Archive(base_dir))
+    mediabox = fitz.paper_rect(page_size)
+    content_area = mediabox + (margin, margin, -margin, -margin)
+
+    buffer = io.BytesIO()
+    writer = fitz.DocumentWriter(buffer)
+    more = True
+    while more:
+        device = writer.begin_page(mediabox)
+        more, _ = story.place(content_area)
+        story.draw(device)
+        writer.end_page()
+    writer.close()
+
+    return buffer.getvalue()
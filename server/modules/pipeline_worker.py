@@ -0,0 +1,274 @@
+import base64
+import logging
+import os
+import tempfile
+import threading
+import time
+
+from .avatars import avatar_base64
+from .cv_pipeline import extract_cv_text, structure_cv
+from .cv_store import replace_cv_sections
+from .job_queue import (
+    LEASE_SECONDS, MAX_ATTEMPTS, RETRY_DELAY_SECONDS, LeaseLost,
+    new_worker_id, claim_job, renew_lease, save_checkpoint, begin_save, release_job, complete_job,
+    retry_or_dead_letter, reap_expired_jobs,
+)
+from .upload_jobs import set_job_stage
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMITED_MESSAGE = "The service is currently experiencing high traffic. Please try again in a few minutes."
+
+
+def user_error_message(error: Exception) -> str:
+    """Message d'échec affiché à l'utilisateur pour une erreur du pipeline."""
+    if "429" in str(error):
+        return RATE_LIMITED_MESSAGE
+    return f"Error processing CV: {error}"
+
+
+def _no_checkpoint(name: str, value, drop_payload: bool = False):
+    pass
+
+
+def _always_owner() -> bool:
+    return True
+
+
+def normalized_photo(image):
+    """
+    Photo de profil trouvée par l'OCR (base64, data URI ou {"image_base64": ...}),
+    normalisée comme les photos envoyées depuis la page d'édition (JPEG réduit).
+
+    :return: JPEG en base64, ou None s'il n'y a pas de photo lisible
+    """
+    if isinstance(image, dict):
+        image = image.get("image_base64")
+    if not image:
+        return None
+    if image.startswith("data:"):
+        image = image.partition(",")[2]
+    try:
+        return avatar_base64(base64.b64decode(image))
+    except ValueError as e:
+        logger.warning(f"Ignoring unreadable profile photo: {e}")
+        return None
+
+
+def run_upload_job(job: dict, cvs_collection, progress, checkpoint=_no_checkpoint, begin_save=_always_owner):
+    """
+    Traite le fichier d'un job d'upload et remplace les sections du CV de l'utilisateur.
+
+    Les étapes payantes reprennent là où une tentative précédente s'est arrêtée :
+    le texte OCR et la photo (`checkpoint.ocr`), puis les sections structurées
+    (`checkpoint.cv_data`, sans la photo). Le fichier envoyé est retiré du job avec
+    le premier checkpoint : le job reste loin de la limite de 16 Mo de MongoDB.
+
+    :param job: Document du job (avec `payload` et ses éventuels checkpoints)
+    :param cvs_collection: Collection MongoDB des CV
+    :param progress: Fonction appelée avec le nom de chaque étape commencée
+    :param checkpoint: Fonction (nom, valeur, drop_payload) qui enregistre le résultat d'une étape
+        (False : bail perdu)
+    :param begin_save: Fonction qui réserve l'écriture du CV (False : bail perdu)
+    :raise LeaseLost: si le bail a été perdu avant la structuration ou l'écriture du CV
+    """
+    done = job.get("checkpoint") or {}
+
+    ocr = done.get("ocr")
+    if ocr is None:
+        # Le dossier temporaire emporte aussi les fichiers intermédiaires (PDF nettoyé, pages)
+        with tempfile.TemporaryDirectory(prefix="cv-upload-") as work_dir:
+            file_path = os.path.join(work_dir, f"upload.{job['extension']}")
+            with open(file_path, "wb") as upload_file:
+                upload_file.write(job["payload"])
+
+            text, image = extract_cv_text(file_path, job["extension"], job["email"], progress)
+        ocr = {"text": text, "photo": normalized_photo(image)}
+        # Bail perdu : un autre worker a repris le job, inutile de payer l'appel au LLM
+        if not checkpoint("ocr", ocr, drop_payload=True):
+            raise LeaseLost(f"Upload job {job['_id']}: lease lost after OCR")
+    else:
+        logger.info(f"Upload job {job['_id']}: resuming after OCR")
+    # Checkpoints d'avant la normalisation : photo brute sous "image"
+    photo = ocr["photo"] if "photo" in ocr else normalized_photo(ocr.get("image"))
+
+    cv_data = done.get("cv_data")
+    if cv_data is None:
+        progress("structuring")
+        cv_data = structure_cv(ocr["text"])
+        checkpoint("cv_data", cv_data)
+    else:
+        logger.info(f"Upload job {job['_id']}: resuming after structuring")
+    if photo:
+        cv_data = {**cv_data, "image_base64": photo}
+
+    # Un fil qui a perdu son bail (reprise par un autre worker, job rendu à l'arrêt)
+    # n'écrase pas le CV
+    if not begin_save():
+        raise LeaseLost(f"Upload job {job['_id']}: lease lost before saving")
+    if replace_cv_sections(cvs_collection, job["user_id"], cv_data, uploaded_at=job.get("created_at")) is None:
+        logger.info(f"Upload job {job['_id']}: a newer upload was already saved, keeping it")
+
+
+class PipelineWorker:
+    """
+    Consommateur de la file des uploads. Un seul fil par processus interroge la file,
+    et seulement quand l'un des `concurrency` emplacements est libre. Il prend alors
+    un job (bail) et le confie à un fil de traitement. Ce fil renouvelle le bail,
+    puis termine le job, le remet en file ou l'envoie aux lettres mortes.
+    Les baux expirés sont récupérés toutes les `reap_interval` secondes.
+
+    Sert aussi bien dans un processus dédié (worker.py) qu'embarqué dans un processus web.
+    """
+
+    def __init__(self, jobs_collection, dead_letters_collection, cvs_collection, concurrency: int = 1,
+                 poll_interval: float = 2.0, lease_seconds: int = LEASE_SECONDS,
+                 max_attempts: int = MAX_ATTEMPTS, retry_delay: float = RETRY_DELAY_SECONDS,
+                 reap_interval: float = 60.0):
+        self.jobs_collection = jobs_collection
+        self.dead_letters_collection = dead_letters_collection
+        self.cvs_collection = cvs_collection
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.reap_interval = reap_interval
+        self._stopping = threading.Event()
+        self._poller = None
+        self._slots = threading.Semaphore(concurrency)
+        # Jobs en cours : worker titulaire du bail -> (identifiant du job, fil de traitement)
+        self._active = {}
+        self._active_lock = threading.Lock()
+
+    def start(self):
+        """Lance le fil qui interroge la file."""
+        self._stopping.clear()
+        self._poller = threading.Thread(target=self._poll, name="pipeline-poller", daemon=True)
+        self._poller.start()
+        logger.info(f"Started pipeline worker ({self.concurrency} job(s) at a time)")
+
+    def stop(self, timeout: float = None) -> bool:
+        """
+        Arrête de prendre des jobs et attend la fin des jobs en cours (bloquant).
+        Passé `timeout`, les jobs encore en cours sont rendus à la file avec leurs
+        checkpoints : un autre worker les reprend sans attendre l'expiration du bail.
+
+        :return: True si tous les jobs en cours se sont terminés dans le délai
+        """
+        self._stopping.set()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        if self._poller is not None:
+            self._poller.join(None if deadline is None else max(0.0, deadline - time.monotonic()))
+        with self._active_lock:
+            threads = [thread for _, thread in self._active.values()]
+        for thread in threads:
+            thread.join(None if deadline is None else max(0.0, deadline - time.monotonic()))
+
+        with self._active_lock:
+            interrupted = {worker_id: job_id for worker_id, (job_id, _) in self._active.items()}
+        for worker_id, job_id in interrupted.items():
+            try:
+                if release_job(self.jobs_collection, job_id, worker_id):
+                    logger.warning(f"Upload job {job_id} released to the queue before shutdown")
+            except Exception as e:
+                # Le bail expirera de lui-même
+                logger.error(f"Could not release upload job {job_id}: {e}")
+
+        return not interrupted
+
+    def in_progress(self) -> int:
+        """Nombre de jobs en cours dans ce processus."""
+        with self._active_lock:
+            return len(self._active)
+
+    def _poll(self):
+        next_reap = time.monotonic()
+        while not self._stopping.is_set():
+            # Aucune requête tant que tous les emplacements sont occupés
+            if not self._slots.acquire(timeout=self.poll_interval):
+                continue
+            handed_over = False
+            try:
+                if time.monotonic() >= next_reap:
+                    next_reap = time.monotonic() + self.reap_interval
+                    reap_expired_jobs(self.jobs_collection, self.dead_letters_collection, self.max_attempts)
+                # Un identifiant par tentative : les écritures d'un fil abandonné restent
+                # refusées, même si ce processus reprend ensuite le même job
+                worker_id = new_worker_id()
+                job = claim_job(self.jobs_collection, worker_id, self.lease_seconds, self.max_attempts)
+                if job is None:
+                    self._stopping.wait(self.poll_interval)
+                    continue
+                thread = threading.Thread(target=self._run, args=(job, worker_id),
+                                          name=f"pipeline-{job['_id']}", daemon=True)
+                with self._active_lock:
+                    self._active[worker_id] = (job["_id"], thread)
+                thread.start()
+                handed_over = True
+            except Exception as e:
+                # MongoDB indisponible : on réessaie au prochain tour
+                logger.error(f"Pipeline worker error: {e}", exc_info=True)
+                self._stopping.wait(self.poll_interval)
+            finally:
+                if not handed_over:
+                    self._slots.release()
+
+    def _run(self, job: dict, worker_id: str):
+        try:
+            self.process(job, worker_id)
+        except Exception as e:
+            # MongoDB indisponible en fin de traitement : le bail expirera
+            logger.error(f"Error finishing upload job {job['_id']}: {e}", exc_info=True)
+        finally:
+            with self._active_lock:
+                self._active.pop(worker_id, None)
+            self._slots.release()
+
+    def _keep_lease(self, job_id, worker_id: str, done: threading.Event):
+        # Renouvelle le bail tant que le job tourne (l'OCR et le LLM peuvent être longs)
+        while not done.wait(self.lease_seconds / 3):
+            if not renew_lease(self.jobs_collection, job_id, worker_id, self.lease_seconds):
+                logger.warning(f"Lost the lease of upload job {job_id}")
+                return
+
+    def process(self, job: dict, worker_id: str):
+        """Traite un job pris par `worker_id` et enregistre son issue."""
+        job_id = job["_id"]
+        logger.info(f"Processing upload job {job_id} (attempt {job['attempts']}/{self.max_attempts})")
+
+        done = threading.Event()
+        heartbeat = threading.Thread(target=self._keep_lease, args=(job_id, worker_id, done), daemon=True)
+        heartbeat.start()
+        try:
+            run_upload_job(
+                job, self.cvs_collection,
+                progress=lambda stage: set_job_stage(self.jobs_collection, job_id, stage, worker_id),
+                checkpoint=lambda name, value, drop_payload=False: self._checkpoint(
+                    job_id, worker_id, name, value, drop_payload),
+                begin_save=lambda: begin_save(self.jobs_collection, job_id, worker_id, self.lease_seconds),
+            )
+        except LeaseLost as e:
+            logger.warning(str(e))
+        except Exception as e:
+            logger.error(f"Error processing upload job {job_id}: {e}")
+            retried = retry_or_dead_letter(
+                self.jobs_collection, self.dead_letters_collection, job, str(e), user_error_message(e),
+                self.max_attempts, self.retry_delay,
+            )
+            if not retried:
+                logger.warning(f"Upload job {job_id} moved to the dead letters after {job['attempts']} attempts")
+        else:
+            complete_job(self.jobs_collection, job_id, worker_id)
+        finally:
+            done.set()
+            heartbeat.join()
+
+    def _checkpoint(self, job_id, worker_id: str, name: str, value, drop_payload: bool = False) -> bool:
+        # Au mieux : sans checkpoint, une reprise refait simplement l'étape.
+        # False seulement si le bail est perdu, pas si l'écriture échoue
+        try:
+            return save_checkpoint(self.jobs_collection, job_id, worker_id, name, value, drop_payload)
+        except Exception as e:
+            logger.warning(f"Could not checkpoint {name} of upload job {job_id}: {e}")
+            return True
@@ -0,0 +1,117 @@
+import gzip
+import os
+from urllib.parse import quote, unquote
+
+try:
+    import brotli
+except ImportError:  # brotli est optionnel : seules les versions .html et .html.gz sont produites
+    brotli = None
+
+from .cv_rendering import THEMES, resolve_theme
+from .file_utils import write_atomic
+from .http_caching import choose_encoding
+
+# 📌 Un fichier par thème du registre : <dossier>/<utilisateur>/<thème>.html(.gz|.br)
+SNAPSHOT_THEMES = tuple(THEMES)
+# Marqueur <dossier>/<utilisateur>/version : empreinte des templates et assets du rendu
+VERSION_FILE = "version"
+
+
+def user_snapshot_dir(base_dir: str, user_name: str):
+    """
+    Dossier des snapshots d'un utilisateur (nom encodé pour rester dans `base_dir`).
+
+    :return: Chemin du dossier, ou None si le nom ne peut pas servir de dossier
+    """
+    safe_name = quote(user_name, safe="")
+    if safe_name in ("", ".", ".."):
+        return None
+    return os.path.join(base_dir, safe_name)
+
+
+def write_snapshot(base_dir: str, user_name: str, theme: str, html: bytes):
+    """
+    Écrit la page rendue et ses versions précompressées (gzip, et brotli si disponible).
+
+    :param base_dir: Dossier racine des snapshots
+    :param user_name: Nom d'utilisateur
+    :param theme: Thème (voir SNAPSHOT_THEMES)
+    :param html: Page HTML encodée en UTF-8
+    """
+    user_dir = user_snapshot_dir(base_dir, user_name)
+    if user_dir is None:
+        return
+    os.makedirs(user_dir, exist_ok=True)
+
+    path = os.path.join(user_dir, f"{theme}.html")
+    # Les versions compressées d'abord : la version brute sert de témoin d'existence
+    write_atomic(path + ".gz", gzip.compress(html, compresslevel=9, mtime=0))
+    if brotli is not None:
+        write_atomic(path + ".br", brotli.compress(html, mode=brotli.MODE_TEXT))
+    write_atomic(path, html)
+
+
+def write_snapshot_version(base_dir: str, user_name: str, version: str):
+    """Marque les snapshots d'un utilisateur comme rendus avec `version` (une fois tous les thèmes écrits)."""
+    user_dir = user_snapshot_dir(base_dir, user_name)
+    if user_dir is None:
+        return
+    os.makedirs(user_dir, exist_ok=True)
+    write_atomic(os.path.join(user_dir, VERSION_FILE), version.encode("utf-8"))
+
+
+def snapshot_version(base_dir: str, user_name: str):
+    """:return: Version des snapshots d'un utilisateur, ou None s'ils n'ont pas de marqueur"""
+    user_dir = user_snapshot_dir(base_dir, user_name)
+    if user_dir is None:
+        return None
+    try:
+        with open(os.path.join(user_dir, VERSION_FILE), "rb") as version_file:
+            return version_file.read().decode("utf-8")
+    except OSError:
+        return None
+
+
+def stale_snapshot_users(base_dir: str, version: str) -> list:
+    """
+    Utilisateurs dont les snapshots ont été rendus avec d'autres templates ou assets
+    (ou avant l'existence du marqueur) : à régénérer après un déploiement.
+    """
+    try:
+        entries = os.listdir(base_dir)
+    except FileNotFoundError:
+        return []
+    stale = []
+    for entry in entries:
+        if not os.path.isdir(os.path.join(base_dir, entry)):
+            continue
+        user_name = unquote(entry)
+        if snapshot_version(base_dir, user_name) != version:
+            stale.append(user_name)
+    return stale
+
+
+def find_snapshot(base_dir: str, user_name: str, theme: str, accept_encoding: str = "", version: str = None):
+    """
+    Cherche le meilleur snapshot servable pour un client.
+
+    :param accept_encoding: En-tête Accept-Encoding de la requête
+    :param version: Version attendue (voir write_snapshot_version) ; un snapshot périmé est ignoré
+    :return: (chemin, content-encoding ou None), ou None si aucun snapshot à jour n'existe
+    """
+    user_dir = user_snapshot_dir(base_dir, user_name)
+    if user_dir is None:
+        return None
+    if version is not None and snapshot_version(base_dir, user_name) != version:
+        return None
+
+    path = os.path.join(user_dir, f"{resolve_theme(theme)}.html")
+    if not os.path.exists(path):
+        return None
+
+    suffixes = {"br": ".br", "gzip": ".gz"}
+    available = [encoding for encoding, suffix in suffixes.items() if os.path.exists(path + suffix)]
+    encoding = choose_encoding(accept_encoding, available)
+    if encoding:
+        return path + suffixes[encoding], encoding
+    return path, None
@@ -0,0 +1,96 @@
+import hashlib
+import json
+import logging
+import os
+import re
+
+from starlette.staticfiles import StaticFiles
+
+from .file_utils import write_atomic
+
+logger = logging.getLogger(__name__)
+
+# 📌 Les fichiers générés portent l'empreinte de leur contenu : <nom>.<hash>.<ext>
+HASH_LENGTH = 10
+FINGERPRINTED_NAME = re.compile(rf"\.[0-9a-f]{{{HASH_LENGTH}}}\.[a-z0-9]+$")
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+_CSS_COMMENTS = re.compile(r"/\*.*?\*/", re.S)
+_CSS_SPACES = re.compile(r"\s+")
+_CSS_PUNCTUATION = re.compile(r"\s*([{};,>])\s*")
+
+
+def minify_css(css: str) -> str:
+    """
+    Minification prudente : commentaires, espaces superflus et derniers `;` des blocs.
+    Les espaces des valeurs (calc, listes d'ombres...) sont conservés.
+    """
+    css = _CSS_COMMENTS.sub("", css)
+    css = _CSS_SPACES.sub(" ", css)
+    css = _CSS_PUNCTUATION.sub(r"\1", css)
+    css = re.sub(r":\s+", ":", css)
+    return css.replace(";}", "}").strip()
+
+
+def build_assets(source_dir: str, output_dir: str) -> dict:
+    """
+    Minifie les feuilles de style de `source_dir` et les écrit sous un nom empreinté.
+
+    Les anciennes versions ne sont pas supprimées : les pages et snapshots déjà en
+    cache continuent de pointer vers une feuille qui existe.
+
+    :param source_dir: Dossier des sources (ex. `assets`)
+    :param output_dir: Dossier servi sous /static
+    :return: Manifeste {chemin source: chemin empreinté}, relatifs aux deux dossiers
+    """
+    manifest = {}
+    for root, _, files in os.walk(source_dir):
+        for file_name in sorted(files):
+            if not file_name.endswith(".css"):
+                continue
+            source_path = os.path.join(root, file_name)
+            relative_path = os.path.relpath(source_path, source_dir).replace(os.sep, "/")
+
+            with open(source_path, encoding="utf-8") as source_file:
+                data = minify_css(source_file.read()).encode("utf-8")
+            digest = hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+            stem, extension = os.path.splitext(relative_path)
+            fingerprinted_path = f"{stem}.{digest}{extension}"
+
+            target_path = os.path.join(output_dir, fingerprinted_path)
+            if not os.path.exists(target_path):
+                os.makedirs(os.path.dirname(target_path), exist_ok=True)
+                write_atomic(target_path, data)
+            manifest[relative_path] = fingerprinted_path
+
+    write_atomic(os.path.join(output_dir, "manifest.json"), json.dumps(manifest, indent=2).encode("utf-8"))
+    logger.info(f"Built {len(manifest)} static assets")
+    return manifest
+
+
+def manifest_fingerprint(manifest: dict) -> str:
+    """Empreinte de l'ensemble des assets, pour les ETags des pages qui les référencent."""
+    return hashlib.sha1(json.dumps(manifest, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+
+
+def asset_url_factory(manifest: dict, prefix: str = "/static/"):
+    """
+    Renvoie la fonction `asset_url(path)` exposée aux templates.
+
+    :param manifest: Manifeste produit par build_assets
+    :param prefix: URL de montage des fichiers statiques
+    """
+    def asset_url(path: str) -> str:
+        return prefix + manifest.get(path, path)
+
+    return asset_url
+
+
+class ImmutableStaticFiles(StaticFiles):
+    """StaticFiles qui marque les fichiers empreintés comme immuables (cache d'un an)."""
+
+    def file_response(self, full_path, stat_result, scope, status_code: int = 200):
+        response = super().file_response(full_path, stat_result, scope, status_code)
+        if FINGERPRINTED_NAME.search(str(full_path)):
+            response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+        return response
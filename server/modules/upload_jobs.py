@@ -0,0 +1,75 @@
+from datetime import datetime
+
+from bson import Binary, ObjectId
+from pymongo import ASCENDING
+
+# 📌 Statuts d'un job d'upload ; l'étape courante est suivie dans `stage`
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+# Les jobs terminés ne servent qu'au suivi : MongoDB les supprime au bout d'une semaine
+JOB_RETENTION_SECONDS = 7 * 24 * 3600
+
+# Le suivi d'un job n'a besoin ni du fichier envoyé, ni des résultats intermédiaires
+JOB_STATUS_PROJECTION = {"payload": 0, "checkpoint": 0}
+
+
+def ensure_job_indexes(jobs_collection):
+    """Crée l'index d'expiration des jobs (idempotent)."""
+    jobs_collection.create_index([("created_at", ASCENDING)], expireAfterSeconds=JOB_RETENTION_SECONDS)
+
+
+def create_job(jobs_collection, user_name: str, user_id, email: str, filename: str, extension: str,
+               payload: bytes) -> ObjectId:
+    """
+    Enregistre un nouveau job d'upload en attente, avec le fichier envoyé : le job est
+    autonome et peut être traité par n'importe quel worker (voir job_queue).
+
+    :param payload: Contenu du fichier (supprimé du job une fois traité)
+    :return: Identifiant du job
+    """
+    now = datetime.utcnow()
+    result = jobs_collection.insert_one({
+        "user_name": user_name,
+        "user_id": ObjectId(user_id),
+        "email": email,
+        "filename": filename,
+        "extension": extension,
+        "payload": Binary(payload),
+        "status": STATUS_QUEUED,
+        "stage": None,
+        "error": None,
+        "attempts": 0,
+        "available_at": now,
+        "created_at": now,
+        "updated_at": now,
+    })
+    return result.inserted_id
+
+
+def set_job_stage(jobs_collection, job_id: ObjectId, stage: str, worker_id: str = None):
+    """
+    Marque le job comme en cours, à l'étape `stage`.
+
+    :param worker_id: Worker titulaire du bail ; l'étape n'est pas écrite s'il l'a perdu
+    """
+    query = {"_id": job_id}
+    if worker_id is not None:
+        query["lease_owner"] = worker_id
+    jobs_collection.update_one(
+        query,
+        {"$set": {"status": STATUS_RUNNING, "stage": stage, "updated_at": datetime.utcnow()}},
+    )
+
+
+def find_job(jobs_collection, job_id: str, user_name: str):
+    """
+    Lit un job d'upload appartenant à `user_name` (sans le fichier envoyé).
+
+    :return: Document du job ou None (identifiant invalide, inconnu ou d'un autre utilisateur)
+    """
+    if not ObjectId.is_valid(job_id):
+        return None
+    return jobs_collection.find_one({"_id": ObjectId(job_id), "user_name": user_name}, JOB_STATUS_PROJECTION)
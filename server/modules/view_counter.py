@@ -0,0 +1,118 @@
+import asyncio
+import logging
+import threading
+from collections import Counter
+from datetime import datetime, timedelta
+
+from pymongo import ASCENDING, UpdateOne
+
+logger = logging.getLogger(__name__)
+
+
+class ViewCounter:
+    """
+    Compteur de vues des pages publiques, agrégé en mémoire.
+
+    `record` ne fait qu'incrémenter un Counter : aucune écriture MongoDB par requête.
+    Les compteurs sont écrits périodiquement par `flush`, en un seul `bulk_write`
+    d'upserts `$inc` (un document par utilisateur, thème et jour), et vidés à l'arrêt.
+    """
+
+    def __init__(self, collection, flush_interval: float = 30.0):
+        self.collection = collection
+        self.flush_interval = flush_interval
+        self._counts = Counter()
+        self._lock = threading.Lock()
+        self._task = None
+
+    def record(self, user_name: str, theme: str):
+        """Compte une vue de la page de `user_name` dans le thème `theme`."""
+        day = datetime.utcnow().strftime("%Y-%m-%d")
+        with self._lock:
+            self._counts[(user_name, theme, day)] += 1
+
+    def pending(self) -> int:
+        """Nombre de vues pas encore écrites."""
+        with self._lock:
+            return sum(self._counts.values())
+
+    def flush(self) -> int:
+        """
+        Écrit les compteurs accumulés en un seul bulk_write.
+        En cas d'échec, les compteurs sont réintégrés pour le prochain flush.
+
+        :return: Nombre de documents mis à jour
+        """
+        with self._lock:
+            counts, self._counts = self._counts, Counter()
+        if not counts:
+            return 0
+
+        operations = [
+            UpdateOne(
+                {"user_name": user_name, "theme": theme, "day": day},
+                {"$inc": {"views": views}},
+                upsert=True,
+            )
+            for (user_name, theme, day), views in counts.items()
+        ]
+        try:
+            self.collection.bulk_write(operations, ordered=False)
+        except Exception as e:
+            logger.error(f"Error flushing view counters: {e}")
+            with self._lock:
+                self._counts.update(counts)
+            return 0
+        return len(operations)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            # pymongo est bloquant : le flush passe par le pool par défaut
+            await loop.run_in_executor(None, self.flush)
+
+    def start(self):
+        """Crée l'index des compteurs et lance le flush périodique (à appeler dans la boucle)."""
+        self.collection.create_index(
+            [("user_name", ASCENDING), ("day", ASCENDING), ("theme", ASCENDING)], unique=True
+        )
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Arrête le flush périodique et écrit les vues restantes."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await asyncio.get_running_loop().run_in_executor(None, self.flush)
+
+
+def view_stats(collection, user_name: str, days: int = 30) -> dict:
+    """
+    Statistiques de vues d'un utilisateur sur les `days` derniers jours.
+
+    :param collection: Collection MongoDB des compteurs
+    :param user_name: Nom d'utilisateur
+    :param days: Nombre de jours couverts
+    :return: {"days", "total", "by_theme": {thème: vues}, "by_day": [{"day", "views"}]}
+    """
+    since = (datetime.utcnow() - timedelta(days=days - 1)).strftime("%Y-%m-%d")
+    by_theme = Counter()
+    by_day = Counter()
+    for doc in collection.find(
+        {"user_name": user_name, "day": {"$gte": since}},
+        {"_id": 0, "theme": 1, "day": 1, "views": 1},
+    ):
+        by_theme[doc["theme"]] += doc["views"]
+        by_day[doc["day"]] += doc["views"]
+
+    return {
+        "days": days,
+        "total": sum(by_day.values()),
+        "by_theme": dict(by_theme),
+        "by_day": [{"day": day, "views": by_day[day]} for day in sorted(by_day)],
+    }
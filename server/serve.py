@@ -0,0 +1,114 @@
+"""
+Point d'entrée de production du serveur.
+
+Lance uvicorn avec plusieurs processus workers (un par cœur disponible par défaut),
+chacun avec sa boucle d'événements et ses propres caches. uvloop et httptools sont
+utilisés lorsqu'ils sont installés (uvicorn[standard]). Les CV envoyés sont traités
+par des processus worker.py lancés à côté, hors des processus web.
+
+Usage (depuis server/) : python serve.py
+
+Variables d'environnement :
+    HOST, PORT            Adresse d'écoute (0.0.0.0:8000)
+    WEB_CONCURRENCY       Nombre de workers (défaut : cœurs disponibles pour le conteneur)
+    BACKLOG               File d'attente des connexions TCP (2048)
+    KEEP_ALIVE_TIMEOUT    Durée (s) de conservation des connexions inactives (65)
+    GRACEFUL_TIMEOUT      À l'arrêt, délai (s) laissé aux requêtes en cours (30) ; le
+                          lifespan draine ensuite les uploads (UPLOAD_DRAIN_TIMEOUT)
+    LOG_LEVEL             Niveau de log uvicorn (info)
+    UPLOAD_WORKER_PROCESSES  Processus worker.py lancés avec le serveur (1) ; 0 quand
+                          le tier de traitement tourne ailleurs
+"""
+import importlib.util
+import logging
+import multiprocessing
+import os
+
+import uvicorn
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def available_cpus() -> int:
+    """
+    Nombre de cœurs réellement utilisables : affinité du processus, bornée par le
+    quota CPU du conteneur (cgroup v2) s'il y en a un.
+    """
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:  # sched_getaffinity n'existe pas sur macOS / Windows
+        cpus = os.cpu_count() or 1
+
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as cpu_max:
+            quota, period = cpu_max.read().split()
+        if quota != "max":
+            cpus = min(cpus, max(1, int(quota) // int(period)))
+    except (OSError, ValueError):
+        pass
+
+    return cpus
+
+
+def _installed(module: str) -> bool:
+    return importlib.util.find_spec(module) is not None
+
+
+def server_options() -> dict:
+    """Options de uvicorn.run, lues dans l'environnement."""
+    return {
+        "host": os.getenv("HOST", "0.0.0.0"),
+        "port": int(os.getenv("PORT", 8000)),
+        "workers": int(os.getenv("WEB_CONCURRENCY", 0)) or available_cpus(),
+        "loop": "uvloop" if _installed("uvloop") else "asyncio",
+        "http": "httptools" if _installed("httptools") else "h11",
+        "backlog": int(os.getenv("BACKLOG", 2048)),
+        # Au-delà du délai d'inactivité des proxys/load balancers (souvent 60 s) :
+        # c'est le proxy qui ferme, jamais le serveur au milieu d'une réutilisation
+        "timeout_keep_alive": int(os.getenv("KEEP_ALIVE_TIMEOUT", 65)),
+        # Une requête bloquée ne doit pas empêcher le drainage des uploads à l'arrêt
+        "timeout_graceful_shutdown": int(os.getenv("GRACEFUL_TIMEOUT", 30)),
+        "log_level": os.getenv("LOG_LEVEL", "info"),
+    }
+
+
+def start_pipeline_processes(count: int) -> list:
+    """Lance `count` processus de traitement des uploads (voir worker.py)."""
+    import worker
+
+    context = multiprocessing.get_context("spawn")
+    processes = [context.Process(target=worker.main, name=f"pipeline-{index}") for index in range(count)]
+    for process in processes:
+        process.start()
+    return processes
+
+
+def stop_pipeline_processes(processes: list):
+    """Demande l'arrêt des processus de traitement et attend leur drainage."""
+    for process in processes:
+        if process.is_alive():
+            process.terminate()  # SIGTERM : le worker draine ses jobs en cours
+    drain_timeout = float(os.getenv("UPLOAD_DRAIN_TIMEOUT", 20))
+    for process in processes:
+        process.join(drain_timeout + 5)
+
+
+def main():
+    options = server_options()
+    pipeline_processes = start_pipeline_processes(int(os.getenv("UPLOAD_WORKER_PROCESSES", 1)))
+    logger.info(
+        f"Starting {options['workers']} worker(s) on {options['host']}:{options['port']} "
+        f"(loop={options['loop']}, http={options['http']}) and {len(pipeline_processes)} pipeline process(es)"
+    )
+    try:
+        uvicorn.run("api:app", **options)
+    finally:
+        stop_pipeline_processes(pipeline_processes)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,24 @@
+import os
+import sys
+
+import pytest
+
+# Les tests importent les modules du serveur comme api.py : depuis server/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+mongomock = pytest.importorskip("mongomock")
+
+
+@pytest.fixture
+def db():
+    return mongomock.MongoClient()["Challenge_SISE"]
+
+
+@pytest.fixture
+def jobs(db):
+    return db["upload_jobs"]
+
+
+@pytest.fixture
+def dead_letters(db):
+    return db["upload_jobs_dead"]
@@ -0,0 +1,85 @@
+import asyncio
+import gzip
+
+import pytest
+
+from modules.http_caching import CompressionMiddleware, choose_encoding, etag_matches
+
+
+def response_app(status=200, body=b"", headers=()):
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": status,
+                    "headers": [(name.encode(), value.encode()) for name, value in headers]})
+        await send({"type": "http.response.body", "body": body})
+    return app
+
+
+def call(app, request_headers):
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {"type": "http", "method": "GET", "path": "/",
+             "headers": [(name.encode(), value.encode()) for name, value in request_headers.items()]}
+    asyncio.run(CompressionMiddleware(app)(scope, receive, send))
+    start, *bodies = messages
+    headers = {name.decode(): value.decode() for name, value in start["headers"]}
+    return start["status"], headers, b"".join(message.get("body", b"") for message in bodies)
+
+
+HTML = [("content-type", "text/html; charset=utf-8"), ("etag", '"abc"')]
+
+
+def test_choose_encoding_follows_q_values():
+    assert choose_encoding("gzip, br", ("br", "gzip")) == "br"
+    assert choose_encoding("br;q=0.5, gzip", ("br", "gzip")) == "gzip"
+    assert choose_encoding("br;q=0, gzip", ("br", "gzip")) == "gzip"
+    assert choose_encoding("*;q=0.1, gzip;q=0", ("br", "gzip")) == "br"
+    assert choose_encoding("gzip;q=0", ("br", "gzip")) is None
+    assert choose_encoding("identity", ("br", "gzip")) is None
+
+
+def test_large_text_is_compressed_with_a_suffixed_etag():
+    body = b"<p>cv</p>" * 500
+    status, headers, data = call(response_app(body=body, headers=HTML), {"accept-encoding": "gzip"})
+
+    assert status == 200
+    assert headers["content-encoding"] == "gzip"
+    assert headers["etag"] == '"abc-gzip"'
+    assert "Accept-Encoding" in headers["vary"]
+    assert int(headers["content-length"]) == len(data)
+    assert gzip.decompress(data) == body
+
+
+def test_small_responses_pass_through():
+    status, headers, data = call(response_app(body=b"<p>cv</p>", headers=HTML), {"accept-encoding": "gzip"})
+
+    assert "content-encoding" not in headers
+    assert headers["etag"] == '"abc"'
+    assert data == b"<p>cv</p>"
+
+
+def test_already_encoded_responses_pass_through():
+    body = gzip.compress(b"<p>cv</p>" * 500)
+    app = response_app(body=body, headers=HTML + [("content-encoding", "gzip")])
+    status, headers, data = call(app, {"accept-encoding": "br, gzip"})
+
+    assert headers["content-encoding"] == "gzip"
+    assert headers["etag"] == '"abc"'
+    assert data == body
+
+
+@pytest.mark.parametrize("held_etag", ['"abc-gzip"', 'W/"abc-gzip"'])
+def test_not_modified_echoes_the_etag_the_client_holds(held_etag):
+    assert etag_matches(held_etag, '"abc"')
+    app = response_app(status=304, headers=[("etag", '"abc"')])
+    status, headers, data = call(app, {"accept-encoding": "gzip", "if-none-match": f'"other", {held_etag}'})
+
+    assert status == 304
+    assert headers["etag"] == held_etag
+    assert "content-encoding" not in headers
+    assert data == b""
@@ -0,0 +1,198 @@
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+from modules.job_queue import (
+    SAVING_STAGE, claim_job, renew_lease, save_checkpoint, begin_save, release_job, complete_job,
+    retry_or_dead_letter, dead_letter_job, reap_expired_jobs, claim_refresh, claim_pending_refreshes, queue_depth,
+)
+from modules.upload_jobs import STATUS_QUEUED, STATUS_RUNNING, STATUS_DONE, STATUS_FAILED, create_job
+
+
+def new_job(jobs, **fields):
+    job_id = create_job(jobs, "bob", ObjectId(), "bob@example.com", "cv.pdf", "pdf", b"%PDF-1.4")
+    if fields:
+        jobs.update_one({"_id": job_id}, {"$set": fields})
+    return job_id
+
+
+def expire_lease(jobs, job_id):
+    jobs.update_one({"_id": job_id}, {"$set": {"lease_expires_at": datetime.utcnow() - timedelta(seconds=1)}})
+
+
+def test_claim_takes_the_oldest_due_job_with_a_lease(jobs):
+    now = datetime.utcnow()
+    newer = new_job(jobs, available_at=now - timedelta(seconds=10))
+    older = new_job(jobs, available_at=now - timedelta(seconds=20))
+    new_job(jobs, available_at=now + timedelta(minutes=5))  # pas encore dû
+
+    job = claim_job(jobs, "w1", lease_seconds=60)
+
+    assert job["_id"] == older
+    assert job["status"] == STATUS_RUNNING
+    assert job["lease_owner"] == "w1"
+    assert job["attempts"] == 1
+    assert job["lease_expires_at"] > now
+    assert claim_job(jobs, "w2")["_id"] == newer
+    assert claim_job(jobs, "w3") is None
+
+
+def test_expired_lease_is_taken_over_and_the_old_owner_is_fenced(jobs):
+    job_id = new_job(jobs)
+    claim_job(jobs, "w1")
+    assert claim_job(jobs, "w2") is None  # bail encore valide
+
+    expire_lease(jobs, job_id)
+    job = claim_job(jobs, "w2")
+
+    assert job["lease_owner"] == "w2"
+    assert job["attempts"] == 2
+    assert not renew_lease(jobs, job_id, "w1")
+    assert not save_checkpoint(jobs, job_id, "w1", "ocr", {"text": "stale"})
+    assert not complete_job(jobs, job_id, "w1")
+    assert renew_lease(jobs, job_id, "w2")
+    assert jobs.find_one({"_id": job_id})["status"] == STATUS_RUNNING
+
+
+def test_job_out_of_attempts_is_not_claimed(jobs):
+    job_id = new_job(jobs)
+    claim_job(jobs, "w1", max_attempts=1)
+    expire_lease(jobs, job_id)
+
+    assert claim_job(jobs, "w2", max_attempts=1) is None
+
+
+def test_release_requeues_without_counting_the_attempt(jobs):
+    job_id = new_job(jobs)
+    claim_job(jobs, "w1")
+    assert save_checkpoint(jobs, job_id, "w1", "ocr", {"text": "paid"})
+
+    assert release_job(jobs, job_id, "w1")
+    assert not release_job(jobs, job_id, "w1")
+
+    job = jobs.find_one({"_id": job_id})
+    assert job["status"] == STATUS_QUEUED
+    assert job["attempts"] == 0
+    assert "lease_owner" not in job
+    assert job["checkpoint"]["ocr"] == {"text": "paid"}
+
+
+def test_complete_drops_the_payload_and_checkpoints(jobs):
+    job_id = new_job(jobs)
+    claim_job(jobs, "w1")
+    save_checkpoint(jobs, job_id, "w1", "ocr", {"text": "paid"})
+
+    assert complete_job(jobs, job_id, "w1")
+
+    job = jobs.find_one({"_id": job_id})
+    assert job["status"] == STATUS_DONE
+    assert job["refreshed"] is False
+    assert "payload" not in job and "checkpoint" not in job and "lease_owner" not in job
+
+
+def test_failed_attempt_is_retried_with_exponential_backoff(jobs, dead_letters):
+    job_id = new_job(jobs)
+    job = claim_job(jobs, "w1", max_attempts=3)
+    assert retry_or_dead_letter(jobs, dead_letters, job, "boom", "Error", max_attempts=3, retry_delay=30)
+    first_delay = jobs.find_one({"_id": job_id})["available_at"] - datetime.utcnow()
+
+    jobs.update_one({"_id": job_id}, {"$set": {"available_at": datetime.utcnow()}})
+    job = claim_job(jobs, "w2", max_attempts=3)
+    assert retry_or_dead_letter(jobs, dead_letters, job, "boom", "Error", max_attempts=3, retry_delay=30)
+    second_delay = jobs.find_one({"_id": job_id})["available_at"] - datetime.utcnow()
+
+    job = jobs.find_one({"_id": job_id})
+    assert job["status"] == STATUS_QUEUED
+    assert len(job["failures"]) == 2
+    assert timedelta(seconds=25) < first_delay <= timedelta(seconds=30)
+    assert timedelta(seconds=55) < second_delay <= timedelta(seconds=60)
+    assert dead_letters.count_documents({}) == 0
+
+
+def test_last_failed_attempt_goes_to_the_dead_letters(jobs, dead_letters):
+    job_id = new_job(jobs)
+    job = claim_job(jobs, "w1", max_attempts=1)
+
+    assert not retry_or_dead_letter(jobs, dead_letters, job, "boom", "Error processing CV", max_attempts=1)
+
+    job = jobs.find_one({"_id": job_id})
+    assert job["status"] == STATUS_FAILED
+    assert job["error"] == "Error processing CV"
+    assert "payload" not in job
+    archived = dead_letters.find_one({"_id": job_id})
+    assert bytes(archived["payload"]) == b"%PDF-1.4"
+    assert archived["failures"][-1]["error"] == "boom"
+
+
+def test_dead_letter_is_fenced_on_the_lease(jobs, dead_letters):
+    job_id = new_job(jobs)
+    stale = claim_job(jobs, "w1")
+    expire_lease(jobs, job_id)
+    claim_job(jobs, "w2")
+
+    assert not dead_letter_job(jobs, dead_letters, stale, {"error": "late"}, "Error")
+    assert jobs.find_one({"_id": job_id})["lease_owner"] == "w2"
+    assert dead_letters.count_documents({}) == 0
+
+
+def test_reap_dead_letters_expired_jobs_without_attempts_left(jobs, dead_letters):
+    exhausted = new_job(jobs)
+    claim_job(jobs, "w1", max_attempts=1)
+    expire_lease(jobs, exhausted)
+    retryable = new_job(jobs)
+    claim_job(jobs, "w2", max_attempts=1)
+    jobs.update_one({"_id": retryable}, {"$set": {"attempts": 0}})
+    expire_lease(jobs, retryable)
+
+    assert reap_expired_jobs(jobs, dead_letters, max_attempts=1) == 1
+
+    assert jobs.find_one({"_id": exhausted})["status"] == STATUS_FAILED
+    assert dead_letters.find_one({"_id": exhausted})["failures"][-1]["error"] == "lease expired"
+    assert jobs.find_one({"_id": retryable})["status"] == STATUS_RUNNING
+
+
+def test_refresh_is_claimed_once(jobs):
+    done = new_job(jobs)
+    claim_job(jobs, "w1")
+    complete_job(jobs, done, "w1")
+    new_job(jobs)
+
+    assert [job["_id"] for job in claim_pending_refreshes(jobs)] == [done]
+    assert claim_pending_refreshes(jobs) == []
+    assert not claim_refresh(jobs, done)
+
+
+def test_queue_depth(jobs):
+    new_job(jobs)
+    new_job(jobs)
+    claim_job(jobs, "w1")
+
+    assert queue_depth(jobs) == {STATUS_QUEUED: 1, STATUS_RUNNING: 1}
+
+
+def test_save_is_reserved_to_the_lease_owner(jobs):
+    job_id = new_job(jobs)
+    claim_job(jobs, "w1")
+    expire_lease(jobs, job_id)
+    claim_job(jobs, "w2")
+
+    assert not begin_save(jobs, job_id, "w1")
+    assert begin_save(jobs, job_id, "w2")
+    assert jobs.find_one({"_id": job_id})["stage"] == SAVING_STAGE
+
+
+def test_job_being_saved_is_not_released(jobs):
+    job_id = new_job(jobs)
+    claim_job(jobs, "w1")
+    begin_save(jobs, job_id, "w1")
+
+    assert not release_job(jobs, job_id, "w1")
+    assert complete_job(jobs, job_id, "w1")
+
+
+def test_released_job_cannot_be_saved(jobs):
+    job_id = new_job(jobs)
+    claim_job(jobs, "w1")
+    release_job(jobs, job_id, "w1")
+
+    assert not begin_save(jobs, job_id, "w1")
@@ -0,0 +1,139 @@
+import base64
+import threading
+import time
+from io import BytesIO
+
+import pytest
+
+from bson import ObjectId
+
+from modules import pipeline_worker
+from modules.pipeline_worker import PipelineWorker
+from modules.job_queue import claim_job, release_job
+from modules.upload_jobs import STATUS_QUEUED, STATUS_DONE, create_job
+
+
+def new_job(jobs):
+    return create_job(jobs, "bob", ObjectId(), "bob@example.com", "cv.pdf", "pdf", b"%PDF-1.4")
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_jobs_are_processed_at_most_concurrency_at_a_time(monkeypatch, db, jobs, dead_letters):
+    running, peak, lock = [0], [0], threading.Lock()
+
+    def fake_run(job, cvs_collection, progress, checkpoint, begin_save):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.05)
+        with lock:
+            running[0] -= 1
+
+    monkeypatch.setattr(pipeline_worker, "run_upload_job", fake_run)
+    job_ids = [new_job(jobs) for _ in range(5)]
+    worker = PipelineWorker(jobs, dead_letters, db["cvs"], concurrency=2, poll_interval=0.01)
+
+    worker.start()
+    wait_until(lambda: jobs.count_documents({"status": STATUS_DONE}) == len(job_ids))
+    assert worker.stop(timeout=1)
+
+    assert peak[0] == 2
+    assert worker.in_progress() == 0
+
+
+def test_stop_releases_jobs_still_running(monkeypatch, db, jobs, dead_letters):
+    started, finish = threading.Event(), threading.Event()
+
+    def slow_run(job, cvs_collection, progress, checkpoint, begin_save):
+        checkpoint("ocr", {"text": "paid", "image": None})
+        started.set()
+        finish.wait(5)
+
+    monkeypatch.setattr(pipeline_worker, "run_upload_job", slow_run)
+    job_id = new_job(jobs)
+    worker = PipelineWorker(jobs, dead_letters, db["cvs"], concurrency=1, poll_interval=0.01)
+
+    worker.start()
+    assert started.wait(5)
+    assert not worker.stop(timeout=0.1)
+    finish.set()
+
+    job = jobs.find_one({"_id": job_id})
+    assert job["status"] == STATUS_QUEUED
+    assert job["attempts"] == 0
+    assert job["checkpoint"]["ocr"]["text"] == "paid"
+
+
+def test_thread_that_lost_its_lease_does_not_save_the_cv(monkeypatch, db, jobs, dead_letters):
+    monkeypatch.setattr(pipeline_worker, "structure_cv", lambda text: {"first_name": "Stale"})
+    job_id = new_job(jobs)
+    worker = PipelineWorker(jobs, dead_letters, db["cvs"])
+    job = claim_job(jobs, "w1")
+    job["checkpoint"] = {"ocr": {"text": "paid", "image": None}}
+    # Le job a été rendu à la file pendant le traitement
+    release_job(jobs, job_id, "w1")
+
+    worker.process(job, "w1")
+
+    assert db["cvs"].count_documents({}) == 0
+    job = jobs.find_one({"_id": job_id})
+    assert job["status"] == STATUS_QUEUED
+    assert "failures" not in job
+
+
+def test_refused_ocr_checkpoint_stops_before_structuring(monkeypatch, db, jobs, dead_letters):
+    structured = []
+    monkeypatch.setattr(pipeline_worker, "extract_cv_text", lambda *args: ("OCR text", None))
+    monkeypatch.setattr(pipeline_worker, "structure_cv", lambda text: structured.append(text) or {})
+    job_id = new_job(jobs)
+    worker = PipelineWorker(jobs, dead_letters, db["cvs"])
+    job = claim_job(jobs, "w1")
+    # Le job a été rendu à la file pendant l'OCR
+    release_job(jobs, job_id, "w1")
+
+    worker.process(job, "w1")
+
+    assert structured == []
+    assert db["cvs"].count_documents({}) == 0
+    job = jobs.find_one({"_id": job_id})
+    assert job["status"] == STATUS_QUEUED
+    assert "checkpoint" not in job
+    assert "failures" not in job
+
+
+def test_ocr_checkpoint_drops_the_file_and_keeps_one_normalized_photo(monkeypatch, db, jobs, dead_letters):
+    Image = pytest.importorskip("PIL.Image")
+    photo = BytesIO()
+    Image.new("RGB", (2000, 2000), (200, 30, 30)).save(photo, "PNG")
+    raw_photo = base64.b64encode(photo.getvalue()).decode()
+    monkeypatch.setattr(pipeline_worker, "extract_cv_text", lambda *args: ("OCR text", raw_photo))
+
+    def fail_structuring(text):
+        raise RuntimeError("LLM down")
+
+    monkeypatch.setattr(pipeline_worker, "structure_cv", fail_structuring)
+    job_id = new_job(jobs)
+    worker = PipelineWorker(jobs, dead_letters, db["cvs"], retry_delay=0)
+
+    worker.process(claim_job(jobs, "w1"), "w1")
+
+    job = jobs.find_one({"_id": job_id})
+    assert "payload" not in job
+    assert job["checkpoint"]["ocr"]["text"] == "OCR text"
+    assert len(job["checkpoint"]["ocr"]["photo"]) < len(raw_photo)
+
+    # La reprise ne refait pas l'OCR et n'enregistre la photo qu'une fois
+    monkeypatch.setattr(pipeline_worker, "extract_cv_text", None)
+    monkeypatch.setattr(pipeline_worker, "structure_cv", lambda text: {"first_name": "Bob"})
+    worker.process(claim_job(jobs, "w2"), "w2")
+
+    assert jobs.find_one({"_id": job_id})["status"] == STATUS_DONE
+    sections = db["cvs"].find_one({})["sections"]
+    assert sections["first_name"] == "Bob"
+    assert sections["image_base64"] == job["checkpoint"]["ocr"]["photo"]
@@ -0,0 +1,25 @@
+from modules.snapshots import (
+    write_snapshot, write_snapshot_version, snapshot_version, stale_snapshot_users, find_snapshot,
+)
+
+
+def test_snapshot_is_served_only_with_the_current_version(tmp_path):
+    base_dir = str(tmp_path)
+    write_snapshot(base_dir, "bob", "standard", b"<html>bob</html>")
+    write_snapshot_version(base_dir, "bob", "v1")
+
+    path, encoding = find_snapshot(base_dir, "bob", "standard", "gzip", version="v1")
+    assert path.endswith("standard.html.gz") and encoding == "gzip"
+    assert find_snapshot(base_dir, "bob", "standard", "gzip", version="v2") is None
+
+
+def test_snapshots_without_the_current_version_are_stale(tmp_path):
+    base_dir = str(tmp_path)
+    for user_name in ("fresh", "old", "jean dupont"):
+        write_snapshot(base_dir, user_name, "standard", b"<html></html>")
+    write_snapshot_version(base_dir, "fresh", "v2")
+    write_snapshot_version(base_dir, "old", "v1")
+
+    assert sorted(stale_snapshot_users(base_dir, "v2")) == ["jean dupont", "old"]
+    assert snapshot_version(base_dir, "jean dupont") is None
+    assert stale_snapshot_users(str(tmp_path / "missing"), "v2") == []
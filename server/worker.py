@@ -0,0 +1,73 @@
+"""
+Tier de traitement des CV envoyés (prétraitement, OCR, structuration par le LLM).
+
+Consomme la file durable `upload_jobs` : les processus web n'y font qu'insérer des
+jobs, ce tier les traite. Plusieurs instances peuvent tourner en parallèle, sur une
+ou plusieurs machines ; un job dont le worker s'arrête est repris à l'expiration
+de son bail. serve.py en lance UPLOAD_WORKER_PROCESSES (1) à côté des processus web ;
+pour un tier séparé, lancer serve.py avec UPLOAD_WORKER_PROCESSES=0 et worker.py
+sur d'autres machines.
+
+Usage (depuis server/) : python worker.py
+
+Variables d'environnement :
+    MONGO_URI              Base MongoDB (par défaut mongodb://localhost:27017)
+    WORKER_CONCURRENCY     Jobs traités en parallèle par ce processus (2)
+    UPLOAD_POLL_INTERVAL   Attente (s) entre deux consultations d'une file vide (2)
+    UPLOAD_LEASE_SECONDS   Durée du bail d'un job (300)
+    UPLOAD_MAX_ATTEMPTS    Tentatives avant envoi aux lettres mortes (3)
+    UPLOAD_REAP_INTERVAL   Période (s) de récupération des baux expirés (60)
+    UPLOAD_DRAIN_TIMEOUT   À l'arrêt, délai (s) laissé aux jobs en cours (20) ; les autres
+                           sont rendus à la file avec leurs résultats OCR/LLM
+"""
+import logging
+import os
+import signal
+import threading
+
+from pymongo import MongoClient
+
+from modules.job_queue import LEASE_SECONDS, MAX_ATTEMPTS, ensure_queue_indexes
+from modules.pipeline_worker import PipelineWorker
+from modules.upload_jobs import ensure_job_indexes
+
+logging.basicConfig(
+    level=logging.DEBUG if os.getenv("LOG_LEVEL") == "debug" else logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def main():
+    client = MongoClient(os.getenv("MONGO_URI", "mongodb://localhost:27017"))
+    db = client["Challenge_SISE"]
+    jobs_collection = db["upload_jobs"]
+
+    ensure_job_indexes(jobs_collection)
+    ensure_queue_indexes(jobs_collection)
+
+    worker = PipelineWorker(
+        jobs_collection, db["upload_jobs_dead"], db["cvs"],
+        concurrency=int(os.getenv("WORKER_CONCURRENCY", 2)),
+        poll_interval=float(os.getenv("UPLOAD_POLL_INTERVAL", 2)),
+        lease_seconds=int(os.getenv("UPLOAD_LEASE_SECONDS", LEASE_SECONDS)),
+        max_attempts=int(os.getenv("UPLOAD_MAX_ATTEMPTS", MAX_ATTEMPTS)),
+        reap_interval=float(os.getenv("UPLOAD_REAP_INTERVAL", 60)),
+    )
+
+    stop_requested = threading.Event()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda *_: stop_requested.set())
+
+    worker.start()
+    stop_requested.wait()
+
+    # Aucun nouveau job n'est pris ; les jobs en cours ont UPLOAD_DRAIN_TIMEOUT pour finir
+    drain_timeout = float(os.getenv("UPLOAD_DRAIN_TIMEOUT", 20))
+    logger.info(f"Stopping: waiting up to {drain_timeout:.0f}s for {worker.in_progress()} job(s) in progress")
+    worker.stop(drain_timeout)
+    client.close()
+
+
+if __name__ == "__main__":
+    main()